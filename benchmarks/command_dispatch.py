@@ -0,0 +1,69 @@
+# run from the repository root: python -m benchmarks.command_dispatch
+import random
+import time
+
+from command_registry import COMMAND_DISPATCHER, COMMAND_REGISTRY
+
+PREFIX = '!'
+MESSAGES = 20000
+COMMAND_SHARE = 0.05
+CHATTER = [
+    'anyone up for guild wars tonight?',
+    'gg',
+    'I finally got the mythic :D',
+    'lol',
+    'how do I beat the tower of doom boss?',
+    'thanks!',
+    'Which team is best for explore?\nI only have legendaries',
+    '> quoted text\nagreed',
+    'check the spoilers channel',
+    'my team: [6000,6001,6002,6003]',
+    'soulforge resets on monday, right?',
+    'brb',
+    'Has anyone done the weekly event yet? it is quite hard this time around, need some help',
+    'https://garyatrics.com/',
+]
+COMMANDS = [
+    '!troop Dwarven Valkyrie', '!weapon sword', 'de!troop Zwerg', '-!kingdom Broken Spire', '!pet crabbie',
+    '!spoilers', '!spoilers troops', '!events', '!help', '!quickhelp', '!class summary', '!class Archer',
+    '!talent tree1', '!traitstones arcane', '!tower', '!towerconfig', '!toplist abc123', '!bookmarks',
+    '!news', '!news subscribe pc', '!lang', '!lang de', '!campaign gold', '!color_kingdoms', '!soulforge',
+    '!levels', '!waffle 4', '!meme', '!pr crabbie 10', '!class_level 1-20', '!drop_rates', '!adventures',
+    'fr-!trait Stoneskin', '!current_event', '!about', '[6000,6001,6002,6003,1]', '!unknown command',
+]
+
+
+def legacy_find(user_command, user_prefix):
+    for command in COMMAND_REGISTRY:
+        match = command['pattern'].search(user_command)
+        if not match:
+            continue
+        groups = match.groupdict()
+        if groups.get('prefix', user_prefix) == user_prefix:
+            return command, groups
+    return None, None
+
+
+def measure(find, corpus):
+    start = time.perf_counter()
+    for message in corpus:
+        find(message, PREFIX)
+    return (time.perf_counter() - start) / len(corpus) * 1000000
+
+
+def main():
+    random.seed(1)
+    corpus = [random.choice(COMMANDS) if random.random() < COMMAND_SHARE else random.choice(CHATTER)
+              for _ in range(MESSAGES)]
+    for message in set(corpus):
+        assert legacy_find(message, PREFIX) == COMMAND_DISPATCHER.find(message, PREFIX), message
+
+    legacy = measure(legacy_find, corpus)
+    dispatcher = measure(COMMAND_DISPATCHER.find, corpus)
+    print(f'{len(corpus)} messages, {COMMAND_SHARE:.0%} commands')
+    print(f'regex scan {legacy:.1f} µs/message')
+    print(f'trie       {dispatcher:.1f} µs/message ({legacy / dispatcher:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# run from the repository root: python -m benchmarks.db_writes
+import asyncio
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+
+from configurations import CONFIG
+from models.db import DB, DBWriter
+
+WRITES = 500
+BOOKMARK_QUERY = 'REPLACE INTO Bookmark (id, author_id, author_name, description, team_code) VALUES (?, ?, ?, ?, ?)'
+PET_RESCUE_QUERY = 'INSERT INTO PetRescue (guild_name, guild_id, channel_name, channel_id, message_id, pet_id, ' \
+                   'alert_message_id, pet_message_id, start_time, lang, mention) ' \
+                   'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+
+
+class LegacyDB:
+    """The previous models.db.DB: a new connection with default settings for every use."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(CONFIG.get('database'),
+                                    detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        self.conn.row_factory = sqlite3.Row
+        self.cursor = self.conn.cursor()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def write(db_class, query, make_params):
+    start = time.perf_counter()
+    for i in range(WRITES):
+        db = db_class()
+        db.cursor.execute(query, make_params(i))
+        db.commit()
+        db.close()
+    return WRITES / (time.perf_counter() - start)
+
+
+def write_concurrently(query, make_params):
+    writer = DBWriter()
+
+    async def write_all():
+        await asyncio.gather(*[writer.execute(query, make_params(i)) for i in range(WRITES)])
+
+    start = time.perf_counter()
+    asyncio.run(write_all())
+    writes_per_second = WRITES / (time.perf_counter() - start)
+    writer.stop()
+    return writes_per_second
+
+
+def bookmark(i):
+    return f'bookmark{i}', '1234', 'author', 'description', '[6000,6001,6002,6003]'
+
+
+def pet_rescue(i):
+    return 'guild', 1, 'channel', 2, i, 3, 0, i, datetime.datetime.utcnow(), 'en', '@everyone'
+
+
+def create_database(folder, name):
+    CONFIG.config['database'] = os.path.join(folder, f'{name}.sqlite3')
+    with open('models/schema.sql') as f:
+        connection = sqlite3.connect(CONFIG.get('database'))
+        connection.executescript(f.read())
+        connection.close()
+
+
+def run(db_class, folder):
+    create_database(folder, db_class.__name__)
+    return write(db_class, BOOKMARK_QUERY, bookmark), write(db_class, PET_RESCUE_QUERY, pet_rescue)
+
+
+def run_group_commit(folder):
+    create_database(folder, DBWriter.__name__)
+    return write_concurrently(BOOKMARK_QUERY, bookmark), write_concurrently(PET_RESCUE_QUERY, pet_rescue)
+
+
+def main():
+    with tempfile.TemporaryDirectory(dir='.') as folder:
+        legacy = run(LegacyDB, folder)
+        pooled = run(DB, folder)
+        grouped = run_group_commit(folder)
+        DB.close_all()
+    print(f'{WRITES} writes each')
+    print(f'{"":<10} {"legacy":>10} {"pooled":>10} {"writer":>10}')
+    for name, *results in zip(('bookmark', 'pet rescue'), legacy, pooled, grouped):
+        print(f'{name:<10} ' + ' '.join(f'{result:8.0f}/s' for result in results))
+    print('legacy: new connection and commit per write, pooled: shared connection and commit per write, '
+          'writer: concurrent writes group committed by the writer thread')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# run from the repository root: python -m benchmarks.entities
+import gc
+import time
+import tracemalloc
+
+import snapshot
+from caches import LRUCache
+from data_source.game_data import GameData
+from search import TeamExpander
+
+LANG = 'en'
+RUNS = 20
+
+
+def measure_memory(freeze):
+    gc.collect()
+    tracemalloc.start()
+    world = GameData()
+    if not freeze:
+        world.freeze_entities = lambda: None
+    world.populate_world_data()
+    # the raw json is the same for both models, drop it before measuring
+    world.data = None
+    world.user_data = None
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory
+
+
+def measure_search(freeze):
+    if not freeze:
+        GameData.freeze_entities = lambda self: None
+    expander = TeamExpander()
+    # without the translation cache every search copies and translates its results
+    expander.translation_cache = LRUCache(0)
+    terms = [troop['reference_name'] for troop in list(expander.troops.values())[1:101]]
+    for term in terms:
+        expander.search_troop(term, LANG)
+    start = time.perf_counter()
+    for _run in range(RUNS):
+        for term in terms:
+            expander.search_troop(term, LANG)
+    return (time.perf_counter() - start) / RUNS / len(terms) * 1000
+
+
+def measure_reads(freeze):
+    if not freeze:
+        GameData.freeze_entities = lambda self: None
+    world = GameData()
+    world.populate_world_data()
+    troops = list(world.troops.values())
+    start = time.perf_counter()
+    for _run in range(RUNS):
+        for troop in troops:
+            for key in ('name', 'colors', 'rarity', 'types', 'roles', 'kingdom'):
+                troop.get(key)
+    return (time.perf_counter() - start) / RUNS / len(troops) * 1e6
+
+
+def main():
+    # always build the world from the game files instead of a pickled snapshot
+    snapshot.load = lambda name, filenames: None
+    snapshot.save = lambda name, filenames, data, valid_until=None: None
+    freeze_entities = GameData.freeze_entities
+    # the first build pays for one time allocations like interned strings and imports
+    measure_memory(True)
+    for label, freeze in (('entities', True), ('dicts', False)):
+        memory = measure_memory(freeze)
+        search_time = measure_search(freeze)
+        GameData.freeze_entities = freeze_entities
+        read_time = measure_reads(freeze)
+        GameData.freeze_entities = freeze_entities
+        print(f'{label:<8} world {memory / 1024:.0f} KiB, !troop {search_time:.3f} ms, '
+              f'troop fields {read_time:.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# run from the repository root: python -m benchmarks.fuzzy_search
+import random
+import statistics
+import time
+
+from search import TeamExpander, _
+from search_index import FuzzyIndex
+from util import extract_search_tag, levenshtein
+
+LANG = 'en'
+QUERIES = 500
+
+
+def misspell(name):
+    position = random.randrange(len(name))
+    operation = random.choice(('delete', 'swap', 'replace'))
+    if operation == 'delete':
+        return name[:position] + name[position + 1:]
+    if operation == 'swap' and position < len(name) - 1:
+        return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+    return name[:position] + random.choice('aeiou') + name[position + 1:]
+
+
+def brute_force(names, search_term, limit=5):
+    real_search = extract_search_tag(search_term)
+    ranked = sorted((levenshtein(real_search, tag), tag) for tag in names)
+    return [names[tag] for distance, tag in ranked[:limit]]
+
+
+def measure(function, queries):
+    durations = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000, max(durations) * 1000
+
+
+def main():
+    random.seed(42)
+    expander = TeamExpander()
+    names = {}
+    for items in (expander.troops, expander.weapons):
+        for item in items.values():
+            if item['name'] == '`?`':
+                continue
+            names.setdefault(extract_search_tag(_(item['name'], LANG)), item['id'])
+    for pet in expander.pets.items.values():
+        names.setdefault(extract_search_tag(pet.translations[LANG].name), pet.id)
+
+    start = time.perf_counter()
+    index = FuzzyIndex(names)
+    build_time = (time.perf_counter() - start) * 1000
+
+    originals = random.choices(list(names), k=QUERIES)
+    queries = [misspell(name) for name in originals]
+    found = sum(names[original] in index.suggest(query) for original, query in zip(originals, queries))
+    agreement = sum(index.suggest(query)[:1] == brute_force(names, query)[:1] for query in queries)
+
+    print(f'{len(names)} names, index built in {build_time:.1f} ms')
+    median, maximum = measure(index.suggest, queries)
+    print(f'trigram index: median {median:.3f} ms, max {maximum:.3f} ms')
+    median, maximum = measure(lambda q: brute_force(names, q), queries)
+    print(f'brute force:   median {median:.3f} ms, max {maximum:.3f} ms')
+    print(f'original name suggested for {found}/{len(queries)} misspellings, '
+          f'top match equal to brute force for {agreement}/{len(queries)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# run from the repository root: python -m benchmarks.relations
+import operator
+import time
+import types
+
+from caches import LRUCache
+from search import TeamExpander, _
+
+LANG = 'en'
+RUNS = 20
+
+
+def legacy_get_troops_with_trait(self, trait, lang):
+    return legacy_get_objects_by_trait(self, trait, 'troop', self.troops, self.translate_troop, lang)
+
+
+def legacy_get_classes_with_trait(self, trait, lang):
+    return legacy_get_objects_by_trait(self, trait, 'class', self.classes, self.translate_class, lang)
+
+
+def legacy_get_objects_by_trait(self, trait, kind, objects, translator, lang):
+    result = []
+    for o in objects.values():
+        trait_codes = [t['code'] for t in o['traits']] if 'traits' in o else []
+        if trait['code'] in trait_codes:
+            result.append(self.get_translated(kind, o, translator, lang))
+    return result
+
+
+def legacy_translate_traitstone(self, traitstone, lang):
+    troops = []
+    for troop_id in traitstone['troop_ids']:
+        amount = sum([t['amount'] for t in self.troops[troop_id]['traitstones'] if t['id'] == traitstone['id']])
+        troops.append([_(self.troops[troop_id]['name'], lang), amount])
+    traitstone['troops'] = sorted(troops, key=operator.itemgetter(1), reverse=True)
+
+    classes = []
+    for class_id in traitstone['class_ids']:
+        amount = sum([t['amount'] for t in self.classes[class_id]['traitstones'] if t['id'] == traitstone['id']])
+        classes.append([_(self.classes[class_id]['name'], lang), amount])
+    traitstone['classes'] = classes
+
+    kingdoms = []
+    for kingdom_id in traitstone['kingdom_ids']:
+        kingdoms.append(_(self.kingdoms[int(kingdom_id)]['name'], lang))
+    if not traitstone['kingdom_ids']:
+        kingdoms.append(_('[ALL_KINGDOMS]', lang))
+    traitstone['kingdoms'] = kingdoms
+
+    traitstone['name'] = _(traitstone['name'], lang)
+    traitstone['troops_title'] = _('[TROOPS]', lang)
+    traitstone['classes_title'] = _('[CLASS]', lang)
+    traitstone['kingdoms_title'] = _('[KINGDOMS]', lang)
+
+
+def measure(function, search_terms):
+    for search_term in search_terms:
+        function(search_term, LANG)
+    start = time.perf_counter()
+    for _run in range(RUNS):
+        for search_term in search_terms:
+            function(search_term, LANG)
+    return (time.perf_counter() - start) / RUNS / len(search_terms) * 1000
+
+
+def run(expander, label):
+    # without the translation cache every query has to resolve its relations again
+    expander.translation_cache = LRUCache(0)
+    trait_terms = [_(trait['name'], LANG) for trait in list(expander.traits.values())[:20]]
+    traitstone_terms = [_(traitstone['name'], LANG) for traitstone in list(expander.traitstones.values())[:20]]
+    trait_time = measure(expander.search_trait, trait_terms)
+    traitstone_time = measure(expander.search_traitstone, traitstone_terms)
+    print(f'{label:<8} !trait {trait_time:.3f} ms, !traitstone {traitstone_time:.3f} ms')
+
+
+def main():
+    expander = TeamExpander()
+    run(expander, 'indexed')
+
+    legacy = TeamExpander()
+    legacy.get_troops_with_trait = types.MethodType(legacy_get_troops_with_trait, legacy)
+    legacy.get_classes_with_trait = types.MethodType(legacy_get_classes_with_trait, legacy)
+    legacy.translate_traitstone = types.MethodType(legacy_translate_traitstone, legacy)
+    legacy.register_search_indexes()
+    run(legacy, 'scanning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+# run from the repository root: python -m benchmarks.spells
+import time
+
+from search import TeamExpander
+from translations import LOCALE_MAPPING
+
+RUNS = 5
+
+
+def measure(function, expander):
+    start = time.perf_counter()
+    for _run in range(RUNS):
+        for lang in LOCALE_MAPPING:
+            for spell_id in expander.spells:
+                function(spell_id, lang)
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def main():
+    expander = TeamExpander()
+    renders = len(expander.spells) * len(LOCALE_MAPPING)
+
+    uncompiled = measure(expander.compile_spell, expander)
+    start = time.perf_counter()
+    for lang in LOCALE_MAPPING:
+        for spell_id in expander.spells:
+            expander.translate_spell(spell_id, lang)
+    warmup = (time.perf_counter() - start) * 1000
+    compiled = measure(expander.translate_spell, expander)
+
+    print(f'{len(expander.spells)} spells x {len(LOCALE_MAPPING)} languages = {renders} descriptions')
+    print(f'rendering every time: {uncompiled:.1f} ms per pass ({uncompiled / renders * 1000:.2f} us each)')
+    print(f'compiling once:       {warmup:.1f} ms')
+    print(f'compiled lookups:     {compiled:.1f} ms per pass ({compiled / renders * 1000:.2f} us each)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# run from the repository root: python -m benchmarks.translations_memory
+import gc
+import tempfile
+import tracemalloc
+
+import translations
+from configurations import CONFIG
+from game_assets import GameAssets
+
+
+def legacy_load():
+    return {lang_code: GameAssets.load(f'GemsOfWar_{language}.json')
+            for lang_code, language in translations.LANGUAGES.items()}
+
+
+def measure(function):
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size / 2 ** 20, peak / 2 ** 20
+
+
+def main():
+    with tempfile.TemporaryDirectory() as snapshot_folder:
+        CONFIG.raw_config['snapshot_folder'] = snapshot_folder
+        # the old code kept one instance in search.py and one in data_source/base_game_data.py
+        legacy = measure(lambda: [legacy_load(), legacy_load()])
+        shared = measure(translations.Translations)
+        snapshot = measure(translations.Translations)
+    print(f'separate instances: {legacy[0]:.1f} MiB resident, {legacy[1]:.1f} MiB peak')
+    print(f'shared store:       {shared[0]:.1f} MiB resident, {shared[1]:.1f} MiB peak')
+    print(f'from snapshot:      {snapshot[0]:.1f} MiB resident, {snapshot[1]:.1f} MiB peak')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import asyncio
 import datetime
+import io
 import json
 import operator
 import os
@@ -19,20 +20,26 @@ import bot_tasks
 import models
 import soulforge_preview
 from base_bot import BaseBot, log
-from command_registry import COMMAND_REGISTRY, add_slash_command, get_all_commands, remove_slash_command
+from command_registry import COMMAND_DISPATCHER, COMMAND_REGISTRY, add_slash_command, get_all_commands, \
+    remove_slash_command
 from configurations import CONFIG
 from discord_wrappers import admin_required, guild_required, owner_required
 from game_constants import CAMPAIGN_COLORS, RARITY_COLORS, TASK_SKIP_COSTS
+from jobs.news_delivery import NEWS_DELIVERY
 from jobs.news_downloader import NewsDownloader
+from metrics import METRICS
 from models.bookmark import BookmarkError
+from models.news_queue import NewsQueue
 from models.pet_rescue import PetRescue
 from models.pet_rescue_config import PetRescueConfig
 from models.toplist import ToplistError
+from render_pool import RenderQueueFull, RenderWorkerError
 from search import TeamExpander, _
 from tower_data import TowerOfDoomData
 from translations import HumanizeTranslator, LANGUAGES, LANGUAGE_CODE_MAPPING
 from util import bool_to_emoticon, chunks, debug, pluralize_author
 from views import Views
+from worker_pool import WORKER_POOL
 
 TOKEN = os.getenv('DISCORD_TOKEN')
 
@@ -56,7 +63,10 @@ class DiscordBot(BaseBot):
         super().__init__(*args, **kwargs)
         log.debug(f'--------------------------- Starting {self.BOT_NAME} v{self.VERSION} --------------------------')
 
+        models.DB.create_schema()
         self.expander = TeamExpander()
+        self.expander.warm_up_in_background()
+        WORKER_POOL.start()
         self.tower_data = TowerOfDoomData(self.my_emojis)
         self.prefix = models.Prefix(CONFIG.get('default_prefix'))
         self.language = models.Language(CONFIG.get('default_language'))
@@ -113,30 +123,40 @@ class DiscordBot(BaseBot):
         self.pet_rescues = await PetRescue.load_rescues(self)
         log.debug(f'Loaded {len(self.pet_rescues)} pet rescues after restart.')
         await self.register_slash_commands()
+        await NEWS_DELIVERY.deliver_pending(self)
 
     async def get_function_for_command(self, user_command, user_prefix):
-        for command in COMMAND_REGISTRY:
-            match = command['pattern'].search(user_command)
-            if not match:
-                continue
-            groups = match.groupdict()
-
-            if groups.get('prefix', user_prefix) == user_prefix:
-                return getattr(self, command['function']), groups
-        return None, None
+        command, groups = COMMAND_DISPATCHER.find(user_command, user_prefix)
+        if not command:
+            return None, None
+        return getattr(self, command['function']), groups
 
     @owner_required
     async def soulforge_preview(self, message, lang, search_term, release_date=None, switch=False, **kwargs):
         async with message.channel.typing():
             start = time.time()
-            weapon_data = self.expander.get_soulforge_weapon_image_data(search_term, release_date, switch, lang)
+            weapon_data = await WORKER_POOL.call(self.expander.get_soulforge_weapon_image_data,
+                                                 search_term, release_date, switch, lang)
             if not weapon_data:
                 e = discord.Embed(title=f'Weapon search for `{search_term}` did not yield any result',
                                   description=':(',
                                   color=self.BLACK)
                 return await self.answer(message, e)
-            image_data = soulforge_preview.render_all(weapon_data)
-            result = discord.File(image_data, f'soulforge_{release_date}.png')
+            try:
+                png = await soulforge_preview.render_cached(weapon_data)
+            except (RenderQueueFull, asyncio.TimeoutError, RenderWorkerError) as error:
+                log.warning(f'Soulforge preview for `{search_term}` failed: {error!r}')
+                if isinstance(error, RenderQueueFull):
+                    description = 'Too many previews are being rendered, please try again later.'
+                elif isinstance(error, asyncio.TimeoutError):
+                    description = 'Rendering the preview took too long and was stopped, please try again later.'
+                else:
+                    description = 'The preview renderer crashed, please try again.'
+                e = discord.Embed(title='Soulforge preview is not available right now',
+                                  description=description,
+                                  color=self.BLACK)
+                return await self.answer(message, e)
+            result = discord.File(io.BytesIO(png), f'soulforge_{release_date}.png')
             duration = time.time() - start
             log.debug(f'Soulforge generation took {duration:0.2f} seconds.')
             await message.channel.send(file=result)
@@ -166,12 +186,11 @@ class DiscordBot(BaseBot):
 
     async def spoilers(self, message, lang, **kwargs):
         _filter = kwargs.get('filter')
-        spoilers = self.expander.get_spoilers(lang)
         e = discord.Embed(title='Spoilers', color=self.WHITE)
         troop_title = self.expander.translate_categories(['troop'], lang)['troop']
         headers = ['Date', 'Rarity', 'Name (ID)']
         if not _filter or _filter.lower() == 'troop':
-            troop_spoilers = [s for s in spoilers if s['type'] == 'troop']
+            troop_spoilers = self.expander.get_spoilers(lang, 'troop')
             extra_spacing = 2
             rarity_width = max([len(t['rarity']) for t in troop_spoilers]) + extra_spacing
             header_widths = [12, rarity_width, 5]
@@ -195,9 +214,8 @@ class DiscordBot(BaseBot):
 
         for spoil_type in [c for c in categories if (not _filter or _filter.lower() == c)]:
             message_lines = ['Date        Name (ID)']
-            for spoiler in spoilers:
-                if spoiler['type'] == spoil_type:
-                    message_lines.append(f'{spoiler["date"]}  {spoiler["name"]} ({spoiler["id"]})')
+            for spoiler in self.expander.get_spoilers(lang, spoil_type):
+                message_lines.append(f'{spoiler["date"]}  {spoiler["name"]} ({spoiler["id"]})')
             if len(message_lines) > 1:
                 result = '\n'.join(self.views.trim_text_lines_to_length(message_lines, 900))
                 e.add_field(name=translated[spoil_type], value=f'```{result}```', inline=False)
@@ -260,6 +278,13 @@ class DiscordBot(BaseBot):
             f'**{_("[PETRESCUE]", lang)} ({_("[JUST_NOW]", lang)})**: {len(self.pet_rescues)}',
         ]
         e.add_field(name=_("[COLLECTION]", lang), value='\n'.join(collections))
+        cache_stats = self.expander.translation_cache.stats()
+        cache_info = [f'**{key}**: {value}' for key, value in cache_stats.items()]
+        e.add_field(name='Translation cache', value='\n'.join(cache_info))
+        metrics = [f'**{name}**: last {metric["last"]:.3f}, max {metric["max"]:.3f}, count {metric["count"]}'
+                   for name, metric in METRICS.as_dict().items()]
+        if metrics:
+            e.add_field(name='Metrics', value='\n'.join(metrics))
 
         await self.answer(message, e)
 
@@ -345,10 +370,14 @@ class DiscordBot(BaseBot):
     async def handle_search(self, message, search_term, lang, title, shortened=False, formatter='{0[name]} `#{0[id]}`',
                             **kwargs):
         search_function = getattr(self.expander, 'search_{}'.format(title.lower()))
-        result = search_function(search_term, lang)
+        result = await WORKER_POOL.call(search_function, search_term, lang)
         if not result:
+            description = ':('
+            suggestions = await WORKER_POOL.call(self.expander.suggest, title.lower(), search_term, lang)
+            if suggestions:
+                description = 'Did you mean:\n' + '\n'.join([formatter.format(item) for item in suggestions])
             e = discord.Embed(title=f'{title} search for `{search_term}` did not yield any result',
-                              description=':(',
+                              description=description,
                               color=self.BLACK)
         elif len(result) == 1:
             view = getattr(self.views, 'render_{}'.format(title.lower()))
@@ -413,7 +442,7 @@ class DiscordBot(BaseBot):
         await self.show_pet_rescue_config(message, lang)
 
     async def class_summary(self, message, lang, **kwargs):
-        result = self.expander.class_summary(lang)
+        result = await WORKER_POOL.call(self.expander.class_summary, lang)
 
         table = prettytable.PrettyTable()
         table.field_names = [
@@ -432,7 +461,7 @@ class DiscordBot(BaseBot):
         await self.answer(message, e)
 
     async def kingdom_summary(self, message, lang, **kwargs):
-        result = self.expander.kingdom_summary(lang)
+        result = await WORKER_POOL.call(self.expander.kingdom_summary, lang)
 
         table = prettytable.PrettyTable()
         table.field_names = [
@@ -612,7 +641,7 @@ class DiscordBot(BaseBot):
         await self.answer(message, e)
 
     async def drop_rates(self, message, lang, **kwargs):
-        drop_chances = self.expander.get_drop_chances(lang)
+        drop_chances = await WORKER_POOL.call(self.expander.get_drop_chances, lang)
         e = self.views.render_drop_chances(drop_chances, lang)
         await self.answer(message, e)
 
@@ -775,31 +804,11 @@ class DiscordBot(BaseBot):
             articles = json.load(f)
             articles.reverse()
         if articles:
-            log.debug(f'Distributing {len(articles)} news articles to {len(self.subscriptions)} channels.')
-        for article in articles:
-            embeds = self.views.render_news(article)
-            for subscription in self.subscriptions:
-                relevant_news = subscription.get(article['platform'])
-                if not relevant_news:
-                    continue
-                channel = self.get_channel(subscription['channel_id'])
-                if not channel:
-                    log.debug(f'Subscription {subscription} is broken, skipping.')
-                    continue
-                log.debug(f'Sending [{article["platform"]}] {article["title"]} to {channel.guild.name}/{channel.name}.')
-                if not await self.is_writable(channel):
-                    message = 'is not writable' if channel else 'does not exist'
-                    log.debug(f'Channel {message}.')
-                    continue
-                try:
-                    for e in embeds:
-                        await channel.send(embed=e)
-                except Exception as ex:
-                    log.error('Could not send out news, exception follows')
-                    log.error(repr(e.fields))
-                    log.exception(ex)
-        with open(NewsDownloader.NEWS_FILENAME, 'w') as f:
-            f.write('[]')
+            log.debug(f'Queueing {len(articles)} news articles for {len(self.subscriptions)} channels.')
+            await NewsQueue.add(articles, self.subscriptions)
+            with open(NewsDownloader.NEWS_FILENAME, 'w') as f:
+                f.write('[]')
+        await NEWS_DELIVERY.deliver_pending(self)
 
     @guild_required
     @admin_required
@@ -862,6 +871,7 @@ if __name__ == '__main__':
     bot_tasks.task_check_for_data_updates.start(client)
     bot_tasks.task_update_pet_rescues.start(client)
     bot_tasks.task_update_dbl_stats.start(client)
+    bot_tasks.task_pregenerate_soulforge_previews.start(client)
     if TOKEN is not None:
         client.run(TOKEN)
     else:
@@ -1,15 +1,22 @@
 import asyncio
 import datetime
 import os
+import time
 
 from discord.ext import tasks
 from game_assets import GameAssets
 
+import soulforge_preview
+import translations
 from base_bot import log
 from configurations import CONFIG
+from data_source.game_data import GameData
 from jobs.news_downloader import NewsDownloader
+from metrics import LoopStallMonitor, METRICS
+from render_pool import RenderQueueFull, RenderWorkerError
 from search import TeamExpander, update_translations
 from translations import LANG_FILES
+from worker_pool import WORKER_POOL
 
 
 @tasks.loop(minutes=1, reconnect=True)
@@ -28,7 +35,7 @@ async def task_check_for_news(discord_client):
     async with lock:
         try:
             downloader = NewsDownloader()
-            downloader.process_news_feed()
+            await downloader.process_news_feed()
             await discord_client.show_latest_news()
         except Exception as e:
             log.error('Could not update news. Stacktrace follows.')
@@ -52,17 +59,113 @@ async def task_check_for_data_updates(discord_client):
     if modified_files:
         log.debug(f'Game file modification detected, reloading {", ".join(modified_files)}.')
         await asyncio.sleep(5)
-        lock = asyncio.Lock()
-        async with lock:
-            try:
-                old_expander = discord_client.expander
-                del discord_client.expander
-                discord_client.expander = TeamExpander()
-                update_translations()
-            except Exception as e:
-                log.error('Could not update game file. Stacktrace follows.')
-                log.exception(e)
-                discord_client.expander = old_expander
+        if set(modified_files) - set(LANG_FILES) - set(GameData.SECTIONS):
+            await reload_game_data(discord_client)
+        else:
+            await reload_game_data_partially(discord_client, modified_files)
+
+
+def build_game_data():
+    new_translations = translations.Translations()
+    with translations.STORE.pinned(new_translations):
+        expander = TeamExpander()
+        expander.validate()
+        expander.warm_up({'en', CONFIG.get('default_language')})
+    return new_translations, expander
+
+
+def get_modified_languages(modified_files):
+    return [lang for filename in modified_files for lang in translations.Translations.get_language_codes(filename)]
+
+
+def update_game_data(expander, modified_files):
+    """Builds the new translations and expander off the event loop, the live ones stay untouched until swapped."""
+    new_translations = None
+    language_files = [filename for filename in modified_files if filename in LANG_FILES]
+    if language_files:
+        new_translations = translations.STORE.get_translations()
+        for filename in language_files:
+            new_translations = new_translations.reload_language(filename)
+        new_translations.save_snapshot()
+    sections = [filename for filename in modified_files if filename in GameData.SECTIONS]
+    with translations.STORE.pinned(new_translations):
+        expander = expander.reloaded(sections)
+    TeamExpander.save_snapshot(expander.world)
+    return new_translations, expander
+
+
+async def reload_game_data_partially(discord_client, modified_files):
+    loop = asyncio.get_event_loop()
+    start = time.time()
+    async with LoopStallMonitor('reload_loop_stall_seconds'):
+        try:
+            new_translations, expander = await loop.run_in_executor(None, update_game_data, discord_client.expander,
+                                                                    modified_files)
+            if new_translations:
+                update_translations(new_translations)
+            discord_client.expander = expander
+            for lang in get_modified_languages(modified_files):
+                expander.forget_pet_translations(lang)
+            WORKER_POOL.start()
+        except Exception as e:
+            log.error('Could not update game file. Stacktrace follows.')
+            log.exception(e)
+            METRICS.increment('reload_failures')
+            return
+    duration = time.time() - start
+    METRICS.observe('partial_reload_seconds', duration)
+    log.debug(f'Reloaded {", ".join(modified_files)} in {duration:.2f} seconds.')
+
+
+async def reload_game_data(discord_client):
+    loop = asyncio.get_event_loop()
+    start = time.time()
+    async with LoopStallMonitor('reload_loop_stall_seconds'):
+        try:
+            new_translations, expander = await loop.run_in_executor(None, build_game_data)
+        except Exception as e:
+            log.error('Could not update game file. Stacktrace follows.')
+            log.exception(e)
+            METRICS.increment('reload_failures')
+            return
+        update_translations(new_translations)
+        discord_client.expander = expander
+        WORKER_POOL.start()
+    expander.warm_up_in_background()
+    asyncio.ensure_future(pregenerate_soulforge_previews(discord_client))
+    duration = time.time() - start
+    METRICS.observe('reload_seconds', duration)
+    log.debug(f'Game data reloaded in {duration:.2f} seconds, '
+              f'event loop stalled for at most {METRICS.get("reload_loop_stall_seconds")["last"]:.3f} seconds.')
+
+
+async def pregenerate_soulforge_previews(discord_client):
+    expander = discord_client.expander
+    week = expander.world.get_upcoming_soulforge_weapons(datetime.date.today())
+    if not week:
+        return
+    release_date = f'{week["start"].month:02d}-{week["start"].day:02d}'
+    lang = CONFIG.get('default_language')
+    for weapon_id in week['weapon_ids']:
+        try:
+            weapon_data = await WORKER_POOL.call(expander.get_soulforge_weapon_image_data,
+                                                 str(weapon_id), release_date, False, lang)
+            if not weapon_data or soulforge_preview.is_cached(weapon_data):
+                continue
+            await soulforge_preview.render_cached(weapon_data)
+        except (RenderQueueFull, asyncio.TimeoutError, RenderWorkerError) as e:
+            log.warning(f'Could not pre-generate soulforge preview for weapon {weapon_id}: {e!r}')
+            continue
+        except Exception as e:
+            log.error('Could not pre-generate soulforge previews. Stacktrace follows.')
+            log.exception(e)
+            return
+        METRICS.increment('soulforge_previews_pregenerated')
+
+
+@tasks.loop(hours=6.0)
+async def task_pregenerate_soulforge_previews(discord_client):
+    await pregenerate_soulforge_previews(discord_client)
 
 
 @tasks.loop(minutes=30.0)
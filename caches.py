@@ -0,0 +1,265 @@
+import bisect
+import datetime
+import os
+import threading
+from collections import OrderedDict
+
+
+def copy_nested(data):
+    if isinstance(data, dict):
+        return {key: copy_nested(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [copy_nested(value) for value in data]
+    # other containers can take part by copying their mutable parts themselves
+    copy = getattr(data, 'copy_nested', None)
+    if copy is not None:
+        return copy(copy_nested)
+    return data
+
+
+class LRUCache:
+    """Entries weigh 1 each unless `weigh` says otherwise, the least recently used go once max_size is exceeded."""
+
+    def __init__(self, max_size, weigh=None):
+        self.max_size = max_size
+        self.weigh = weigh or (lambda value: 1)
+        self.entries = OrderedDict()
+        self.weights = {}
+        self.weight = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        weight = self.weigh(value)
+        with self.lock:
+            self.weight += weight - self.weights.get(key, 0)
+            self.entries[key] = value
+            self.weights[key] = weight
+            self.entries.move_to_end(key)
+            while self.entries and self.weight > self.max_size:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        del self.entries[key]
+        self.weight -= self.weights.pop(key)
+
+    def get_or_create(self, key, factory):
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return copy_nested(value)
+
+    def invalidate(self, predicate):
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                self.remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.weights.clear()
+            self.weight = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'weight': self.weight,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class ScheduledCache:
+    """Caches time dependent results until the next boundary of a schedule, e.g. a release date, passes."""
+
+    def __init__(self, boundaries, clock=datetime.datetime.now):
+        self.boundaries = sorted(boundaries)
+        self.clock = clock
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def next_boundary(self, now):
+        index = bisect.bisect_right(self.boundaries, now)
+        if index < len(self.boundaries):
+            return self.boundaries[index]
+        return None
+
+    def get_or_create(self, key, factory):
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] is None or now < entry[0]):
+                self.hits += 1
+                return copy_nested(entry[1])
+            self.misses += 1
+            if entry is not None:
+                self.expirations += 1
+        value = factory(now)
+        with self.lock:
+            self.entries[key] = (self.next_boundary(now), value)
+        return copy_nested(value)
+
+    def invalidate(self, predicate):
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+        }
+
+
+class DiskLRUCache:
+    """
+    Keeps files in a folder up to a total size, evicting the least recently used ones first. The folder may be shared
+    by several processes, so before evicting the sizes are read from the directory again.
+    """
+    # share of max_bytes this process may write before it looks at the directory again
+    RESCAN_FRACTION = 0.1
+
+    def __init__(self, folder, max_bytes, suffix=''):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.entries = OrderedDict()
+        self.unscanned_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load()
+
+    def load(self):
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(self.scan()))
+
+    def scan(self):
+        """(mtime, key, size) of every file in the folder. `get` touches what it reads, so mtime is the last use."""
+        if not os.path.isdir(self.folder):
+            return []
+        files = []
+        for entry in os.scandir(self.folder):
+            if not entry.name.endswith(self.suffix) or entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                # removed by another process in the meantime
+                continue
+            files.append((stat.st_mtime, entry.name[:len(entry.name) - len(self.suffix)], stat.st_size))
+        return files
+
+    def adopt(self, key):
+        # the file may have been written by another process sharing the folder
+        try:
+            self.entries[key] = os.path.getsize(self.path(key))
+        except OSError:
+            return False
+        return True
+
+    def path(self, key):
+        return os.path.join(self.folder, f'{key}{self.suffix}')
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries or self.adopt(key)
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries and not self.adopt(key):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self.path(key))
+        except OSError:
+            with self.lock:
+                self.entries.pop(key, None)
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data
+
+    def set(self, key, data):
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = f'{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self.path(key))
+        with self.lock:
+            self.entries[key] = len(data)
+            self.entries.move_to_end(key)
+            self.unscanned_bytes += len(data)
+            if self.size() <= self.max_bytes and self.unscanned_bytes <= self.max_bytes * self.RESCAN_FRACTION:
+                return
+        self.evict(key)
+
+    def evict(self, newest):
+        files = self.scan()
+        with self.lock:
+            # mtimes are coarse, within the same tick the order this process has seen decides
+            rank = {key: i for i, key in enumerate(self.entries)}
+            files.sort(key=lambda file: (file[0], rank.get(file[1], -1)))
+            self.entries = OrderedDict((key, size) for _, key, size in files)
+            if newest in self.entries:
+                self.entries.move_to_end(newest)
+            self.unscanned_bytes = 0
+            size = self.size()
+            evicted = []
+            while len(self.entries) > 1 and size > self.max_bytes:
+                old_key, old_size = self.entries.popitem(last=False)
+                evicted.append(old_key)
+                size -= old_size
+                self.evictions += 1
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except OSError:
+                pass
+
+    def size(self):
+        return sum(self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'bytes': self.size(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -328,7 +328,8 @@ COMMAND_REGISTRY = [
         # \[(?P<weapon_troops>([167]\d{3},?)+){1,4}(?P<banner>3\d{3},?)?(?P<talents>([0-3]{1},?){7})?(?P<class>\d{5})?\]
         'pattern': re.compile(
             NO_QUOTE + LANG_PATTERN + r'(?P<shortened>-)?\[(?P<team_code>(\d+,?){1,13})].*',
-            MATCH_OPTIONS | re.DOTALL)
+            MATCH_OPTIONS | re.DOTALL),
+        'trigger': '[',
     },
     {
         'function': 'news_subscribe',
@@ -480,6 +481,68 @@ COMMAND_REGISTRY = [
     }
 ]
 
+KEYWORD_PATTERN = re.compile(r'\(\?P<prefix>\.\)(?P<keyword>[a-z_ ]*)(?P<quantifier>[?*{])?')
+
+
+class CommandDispatcher:
+    """
+    Finds the command for a message without running every pattern of the registry.
+
+    Every prefixed pattern is filed in a trie under the literal keyword following its prefix,
+    messages are parsed for `[lang][-]<prefix>` once per line and only the patterns found along
+    the trie path are matched, in registry order, so the result is the same as trying all of them.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.trie = {'commands': [], 'children': {}}
+        self.triggered = []
+        for index, command in enumerate(registry):
+            if 'trigger' in command:
+                self.triggered.append(index)
+                continue
+            match = KEYWORD_PATTERN.search(command['pattern'].pattern)
+            keyword = match.group('keyword') if match else ''
+            if match and match.group('quantifier'):
+                keyword = keyword[:-1]
+            node = self.trie
+            for char in keyword.lower():
+                node = node['children'].setdefault(char, {'commands': [], 'children': {}})
+            node['commands'].append(index)
+
+    def get_candidates(self, user_command, user_prefix):
+        candidates = {index for index in self.triggered if self.registry[index]['trigger'] in user_command}
+        if user_prefix not in user_command:
+            return candidates
+        for line in user_command.lower().split('\n'):
+            starts = [0] + [len(lang) for lang in LANGUAGES if line.startswith(lang)]
+            starts += [start + 1 for start in starts if line[start:start + 1] == '-']
+            for start in starts:
+                if line[start:start + 1] != user_prefix.lower():
+                    continue
+                node = self.trie
+                candidates.update(node['commands'])
+                for char in line[start + 1:]:
+                    node = node['children'].get(char)
+                    if node is None:
+                        break
+                    candidates.update(node['commands'])
+        return candidates
+
+    def find(self, user_command, user_prefix):
+        for index in sorted(self.get_candidates(user_command, user_prefix)):
+            command = self.registry[index]
+            match = command['pattern'].search(user_command)
+            if not match:
+                continue
+            groups = match.groupdict()
+            if groups.get('prefix', user_prefix) == user_prefix:
+                return command, groups
+        return None, None
+
+
+COMMAND_DISPATCHER = CommandDispatcher(COMMAND_REGISTRY)
+
 
 # taken from https://github.com/eunwoo1104/discord-py-slash-command
 async def add_slash_command(bot_id,
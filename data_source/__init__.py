@@ -5,7 +5,9 @@ from data_source.spell import Spell
 from data_source.trait import Trait
 from data_source.troop import Troop
 from data_source.weapon import Weapon
+from search_index import FuzzyIndex
 from translations import LANGUAGE_CODE_MAPPING
+from util import extract_search_tag
 
 
 class Collection:
@@ -14,6 +16,7 @@ class Collection:
         data_class = globals()[data_class_name]
 
         self.items = {}
+        self.fuzzy_indexes = {}
         for entry in data:
             item = data_class(entry)
             self.items[item.id] = item
@@ -45,6 +48,28 @@ class Collection:
                 possible_matches.append(item.translations[lang])
         return possible_matches
 
+    def suggest(self, search_term, lang, limit=5):
+        lang = LANGUAGE_CODE_MAPPING.get(lang, lang)
+        if lang not in self.fuzzy_indexes:
+            names = {}
+            for item in self.items.values():
+                name = item.translations[lang].name
+                if name != '`?`':
+                    names.setdefault(extract_search_tag(name), item.id)
+            self.fuzzy_indexes[lang] = FuzzyIndex(names)
+        item_ids = self.fuzzy_indexes[lang].suggest(search_term, limit)
+        return [self.items[item_id].translations[lang] for item_id in item_ids]
+
+    def translate_language(self, lang):
+        for item in self.items.values():
+            item.forget_translation(lang)
+        self.fuzzy_indexes.pop(lang, None)
+
+    def warm_up(self, languages):
+        for item in self.items.values():
+            for lang in languages:
+                item.translations[lang]
+
     @classmethod
     def from_json(cls, json_string):
         data = json.loads(json_string)
@@ -3,7 +3,7 @@ import copy
 import translations
 from util import dig, extract_search_tag
 
-_ = translations.Translations().get
+_ = translations.translate
 
 
 class BaseGameData:
@@ -13,9 +13,6 @@ class BaseGameData:
     def set_release_date(self, release_date):
         self.data['release_date'] = release_date
 
-    def set_kingdom_name(self, kingdom_name):
-        self.data['kingdom_name'] = kingdom_name
-
     def get(self, key, default=None):
         return self.data.get(key, default)
 
@@ -23,30 +20,57 @@ class BaseGameData:
         return item in self.data
 
     def __getattr__(self, item):
-        return self.data[item]
+        try:
+            return self.__dict__['data'][item]
+        except KeyError:
+            raise AttributeError(item)
 
     def __str__(self):
         return f'<Pet id={self.data["id"]} name={self.data["reference_name"]} kingdom={self.data["kingdom_id"]}>'
 
 
+class LazyTranslations(dict):
+    def __init__(self, container):
+        super().__init__()
+        self.container = container
+
+    def __missing__(self, lang):
+        if lang not in translations.LOCALE_MAPPING:
+            raise KeyError(lang)
+        return self.setdefault(lang, self.container.create_translation(lang))
+
+    def __reduce__(self):
+        return self.__class__, (self.container,)
+
+
 class BaseGameDataContainer:
     DATA_CLASS = None
     LOOKUP_KEYS = []
 
     def __init__(self):
         self.data = {}
-        self.translations = {}
+        self.overrides = {}
+        self.translations = LazyTranslations(self)
 
-    def translate_one_language(self, lang):
+    def create_translation(self, lang):
         item = copy.deepcopy(self.data)
         self.deep_translate(item, lang)
         if self.is_untranslated(item['name']) and 'reference_name' in item:
             item['name'] = item['reference_name']
-        self.translations[lang] = self.DATA_CLASS(item)
+        item.update(self.overrides)
+        return self.DATA_CLASS(item)
+
+    def forget_translation(self, lang):
+        self.translations.pop(lang, None)
 
     def translate(self):
         for lang in translations.LOCALE_MAPPING.keys():
-            self.translate_one_language(lang)
+            self.translations[lang]
+
+    def set_override(self, key, value):
+        self.overrides[key] = value
+        for item in list(self.translations.values()):
+            item.data[key] = value
 
     @staticmethod
     def is_untranslated(param):
@@ -55,7 +79,10 @@ class BaseGameDataContainer:
         return param[0] + param[-1] == '[]'
 
     def __getattr__(self, item):
-        return self.data[item]
+        try:
+            return self.__dict__['data'][item]
+        except KeyError:
+            raise AttributeError(item)
 
     def __getitem__(self, item):
         return self.translations[item]
@@ -74,8 +101,8 @@ class BaseGameDataContainer:
 
     def set_release_date(self, release_date):
         self.data['release_date'] = release_date
-        for lang in translations.LOCALE_MAPPING.keys():
-            self.translations[lang].set_release_date(release_date)
+        for item in list(self.translations.values()):
+            item.set_release_date(release_date)
 
     def matches(self, search_term, lang):
         compacted_search = extract_search_tag(search_term)
@@ -95,5 +122,4 @@ class BaseGameDataContainer:
 
     def fill_untranslated_kingdom_name(self, kingdom_id, kingdom_reference_name):
         if self.data['kingdom_id'] == kingdom_id and self.is_untranslated(self.translations['en'].kingdom_name):
-            for item in self.translations.values():
-                item.set_kingdom_name(kingdom_reference_name)
+            self.set_override('kingdom_name', kingdom_reference_name)
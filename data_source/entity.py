@@ -0,0 +1,157 @@
+import sys
+import threading
+from collections.abc import Mapping, MutableMapping
+
+from game_constants import COLORS
+
+
+class Codec:
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        self.lock = threading.Lock()
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(intern(value))
+                    self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+    def canonical(self, value):
+        return self.values[self.encode(value)]
+
+
+def intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class Entity(Mapping):
+    """Read only, dict like game entity. Enumerated values are registered with a codec and stored once."""
+    __slots__ = ()
+    ENUMS = {}
+    FIELDS = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = frozenset(cls.__slots__)
+
+    def __init__(self, data):
+        self.fill(data)
+
+    def fill(self, data):
+        for key, value in data.items():
+            codec = self.ENUMS.get(key)
+            # enumerated values are shared through their codec, reads return them without decoding
+            if codec is None:
+                value = intern(value)
+            elif isinstance(value, list):
+                value = tuple(codec.canonical(v) for v in value)
+            elif value is not None:
+                value = codec.canonical(value)
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{self.__class__.__name__} is read only.')
+
+    def __delattr__(self, key):
+        raise AttributeError(f'{self.__class__.__name__} is read only.')
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        try:
+            value = getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+        if type(value) is tuple:
+            return list(value)
+        return value
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        value = getattr(self, key, default)
+        if type(value) is tuple:
+            return list(value)
+        return value
+
+    def __contains__(self, key):
+        return key in self.FIELDS and hasattr(self, key)
+
+    def __iter__(self):
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def copy(self):
+        return {key: self[key] for key in self}
+
+    def __getstate__(self):
+        return {key: self[key] for key in self}
+
+    def __setstate__(self, state):
+        self.fill(state)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} id={self.get("id")} name={self.get("name")}>'
+
+
+class TranslatedView(MutableMapping):
+    """Fields written by a request live in the view, everything else is read from the shared entity."""
+    __slots__ = ('_entity', '_changes')
+
+    def __init__(self, entity, changes=None):
+        self._entity = entity
+        self._changes = {} if changes is None else changes
+
+    def __getitem__(self, key):
+        if key in self._changes:
+            return self._changes[key]
+        return self._entity[key]
+
+    def __setitem__(self, key, value):
+        self._changes[key] = value
+
+    def __delitem__(self, key):
+        raise KeyError(f'{key} cannot be removed from a {self.__class__.__name__}.')
+
+    def __contains__(self, key):
+        return key in self._changes or key in self._entity
+
+    def __iter__(self):
+        yield from self._entity
+        yield from (key for key in self._changes if key not in self._entity)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self):
+        return TranslatedView(self._entity, dict(self._changes))
+
+    def copy_nested(self, copy):
+        return TranslatedView(self._entity, copy(self._changes))
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} id={self.get("id")} name={self.get("name")}>'
+
+
+COLOR_CODES = Codec(COLORS)
+RARITY_CODES = Codec()
+TYPE_CODES = Codec()
+ROLE_CODES = Codec()
@@ -1,16 +1,34 @@
+import bisect
 import datetime
 import operator
 import re
 
 from data_source import Pets
+from data_source.hero_class import HeroClass
+from data_source.kingdom import Kingdom
+from data_source.troop import Troop
+from data_source.weapon import Weapon
 from game_assets import GameAssets
 from game_constants import COLORS, EVENT_TYPES, SOULFORGE_ALWAYS_AVAILABLE
+from search_index import DateRangeIndex
 from util import U, convert_color_array
 
 NO_TRAIT = {'code': '', 'name': '[TRAIT_NONE]', 'description': '[TRAIT_NONE_DESC]'}
+KINGDOM_TASK_CATEGORIES = {
+    'Own{x}Troops': 'troops',
+    'Own{x}Weapons': 'weapons',
+    'Own{x}Classes': 'classes',
+    'Own{x}Pets': 'pets',
+}
 
 
 class GameData:
+    SOURCE_FILES = ['World.json', 'User.json', 'Campaign.json', 'Soulforge.json', 'Event.json']
+    SECTIONS = {
+        'Campaign.json': ('campaign_data', 'campaign_tasks', 'populate_campaign_tasks'),
+        'Soulforge.json': ('soulforge_raw_data', 'soulforge', 'populate_soulforge'),
+        'Event.json': ('event_raw_data', 'weekly_event', 'populate_weekly_event_details'),
+    }
 
     def __init__(self):
         self.data = None
@@ -39,6 +57,8 @@ class GameData:
         self.talent_trees = {}
         self.spoilers = []
         self.events = []
+        self.spoiler_index = DateRangeIndex([], 'date')
+        self.event_index = DateRangeIndex([], 'start', 'end')
         self.soulforge_weapons = []
         self.campaign_tasks = {}
         self.campaign_data = {}
@@ -51,6 +71,11 @@ class GameData:
         self.event_kingdoms = []
         self.event_raw_data = {}
         self.weekly_event = {}
+        self.relations = {}
+        self.kingdom_tasks = []
+        self.kingdom_release_dates = {}
+        self.max_power_levels = {}
+        self.max_power_levels_valid_until = datetime.datetime.min
 
     def read_json_data(self):
         self.data = GameAssets.load('World.json')
@@ -78,12 +103,46 @@ class GameData:
         self.populate_campaign_tasks()
         self.populate_soulforge()
         self.populate_traitstones()
+        self.populate_relations()
         self.populate_hero_levels()
         self.populate_max_power_levels()
         self.populate_adventure_board()
         self.populate_drop_chances()
         self.populate_event_kingdoms()
         self.populate_weekly_event_details()
+        self.freeze_entities()
+
+    def freeze_entities(self):
+        collections = ((self.troops, Troop), (self.weapons, Weapon), (self.kingdoms, Kingdom),
+                       (self.classes, HeroClass))
+        entities = {}
+        for items, entity_class in collections:
+            for item in items.values():
+                entities[id(item)] = entity_class.__new__(entity_class)
+        for items, entity_class in collections:
+            for key, item in items.items():
+                entity = entities[id(item)]
+                entity.fill({field: entities.get(id(value), value) if isinstance(value, dict) else value
+                             for field, value in item.items()})
+                items[key] = entity
+
+    def reload_section(self, filename):
+        raw_attribute, attribute, populate = self.SECTIONS[filename]
+        raw_data = {}
+        if GameAssets.exists(filename):
+            raw_data = GameAssets.load(filename)
+        setattr(self, raw_attribute, raw_data)
+        setattr(self, attribute, {})
+        getattr(self, populate)()
+        return attribute
+
+    def get_expiry_date(self):
+        now = datetime.datetime.now()
+        tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min)
+        release_dates = [item['release_date'] for items in (self.troops, self.weapons, self.classes)
+                         for item in items.values() if 'release_date' in item]
+        release_dates += [pet.data['release_date'] for pet in self.pets.items.values() if 'release_date' in pet.data]
+        return min([date for date in release_dates if date > now] + [tomorrow])
 
     def populate_classes(self):
         for _class in self.data['HeroClasses']:
@@ -242,12 +301,10 @@ class GameData:
         if 'CurrentEventKingdomId' in self.user_data['pEconomyModel']:
             return self.user_data['pEconomyModel']['CurrentEventKingdomId']
         today = datetime.date.today()
-        weekly_events = [e for e in self.events
+        weekly_events = [e for e in self.event_index.active_on(today, '[WEEKLY_EVENT]')
                          if e['end'] - e['start'] == datetime.timedelta(days=7)
-                         and e['start'] <= today <= e['end']
                          and e['start'].weekday() == 0
-                         and e['kingdom_id']
-                         and e['type'] == '[WEEKLY_EVENT]']
+                         and e['kingdom_id']]
         if not weekly_events:
             return 3000
         event_kingdom_id = weekly_events[0]['kingdom_id']
@@ -367,10 +424,10 @@ class GameData:
             1294, 1239, 1223, 1222, 1272, 1252, 1287, 1275, 1251, 1238, 1224, 1296, 1273, 1274, 1286, 1225
         ]
         for event in week_long_events:
-            kingdom_weapons = [w['id'] for w in self.weapons.values()
-                               if 'kingdom' in w and w['kingdom']['id'] == event['kingdom_id']
-                               and w['id'] not in non_craftable_weapon_ids
-                               and w.get('release_date', datetime.datetime.min).date() < event['end']]
+            weapon_ids = self.kingdoms.get(event['kingdom_id'], {}).get('weapon_ids', [])
+            kingdom_weapons = [w_id for w_id in weapon_ids
+                               if w_id not in non_craftable_weapon_ids
+                               and self.weapons[w_id].get('release_date', datetime.datetime.min).date() < event['end']]
             self.soulforge_weapons.append({
                 'start': event['start'],
                 'end': event['end'],
@@ -379,6 +436,12 @@ class GameData:
 
         self.events.sort(key=operator.itemgetter('start'))
         self.spoilers.sort(key=operator.itemgetter('date'))
+        self.event_index = DateRangeIndex(self.events, 'start', 'end')
+        self.spoiler_index = DateRangeIndex(self.spoilers, 'date')
+
+    def get_upcoming_soulforge_weapons(self, today):
+        upcoming = [week for week in self.soulforge_weapons if week['start'] > today]
+        return min(upcoming, key=operator.itemgetter('start'), default=None)
 
     def enrich_kingdoms(self):
         for kingdom_id, kingdom_data in self.user_data['pEconomyModel']['KingdomLevelData'].items():
@@ -393,9 +456,9 @@ class GameData:
                     kingdom['underworld'] and kingdom['troop_ids']]
         for faction_id, faction_data in factions:
             kingdom_id = faction_data['linked_kingdom_id']
-            faction_weapons = [w['id'] for w in self.weapons.values()
-                               if w['kingdom']['id'] == kingdom_id
-                               and w['requirement'] == 1000
+            weapon_ids = self.kingdoms.get(kingdom_id, {}).get('weapon_ids', [])
+            faction_weapons = [w['id'] for w in [self.weapons[w_id] for w_id in weapon_ids]
+                               if w['requirement'] == 1000
                                and sorted(w['colors']) == sorted(faction_data['colors'])
                                and w['rarity'] == 'Epic'
                                ]
@@ -468,6 +531,43 @@ class GameData:
                 rune_name = self.get_rune_name_from_id(rune_id)
                 self.traitstones[rune_name]['kingdom_ids'].add(kingdom_id)
 
+    def populate_relations(self):
+        trait_troops = {}
+        trait_classes = {}
+        for relation, items in ((trait_troops, self.troops), (trait_classes, self.classes)):
+            for item_id, item in items.items():
+                for trait_code in dict.fromkeys(t['code'] for t in item.get('traits', [])):
+                    relation.setdefault(trait_code, []).append(item_id)
+
+        traitstone_troops = {}
+        traitstone_classes = {}
+        for traitstone in self.traitstones.values():
+            traitstone_troops[traitstone['name']] = [
+                (troop_id, self.get_rune_amount(self.troops[troop_id], traitstone['id']))
+                for troop_id in traitstone['troop_ids']
+            ]
+            traitstone_classes[traitstone['name']] = [
+                (class_id, self.get_rune_amount(self.classes[class_id], traitstone['id']))
+                for class_id in traitstone['class_ids']
+            ]
+
+        color_kingdoms = {color: [] for color in COLORS}
+        for kingdom_id, kingdom in self.kingdoms.items():
+            if 'primary_color' in kingdom and kingdom['location'] == 'krystara':
+                color_kingdoms[kingdom['primary_color']].append(kingdom_id)
+
+        self.relations = {
+            'trait_troops': trait_troops,
+            'trait_classes': trait_classes,
+            'traitstone_troops': traitstone_troops,
+            'traitstone_classes': traitstone_classes,
+            'color_kingdoms': color_kingdoms,
+        }
+
+    @staticmethod
+    def get_rune_amount(item, rune_id):
+        return sum([rune['amount'] for rune in item['traitstones'] if rune['id'] == rune_id])
+
     def extract_runes(self, runes):
         result = {}
         for trait in runes:
@@ -497,34 +597,58 @@ class GameData:
 
     def populate_max_power_levels(self):
         pattern = re.compile(r'KingdomTask(?P<level>[0-9]+)-.+')
+        for task in self.user_data['pTasksData']['Kingdom']:
+            match = pattern.match(task['Id'])
+            if not match:
+                print(f'Match is broken for kingdom task {task["Id"]}')
+                continue
+            self.kingdom_tasks.append((int(match.group('level')), task))
+
+        owned_items = {
+            'troops': [(troop.get('kingdom_id'), troop) for troop in self.troops.values()],
+            'weapons': [(weapon.get('kingdom_id'), weapon) for weapon in self.weapons.values()],
+            'classes': [(_class.get('kingdom_id'), _class) for _class in self.classes.values()],
+            'pets': [(pet.data.get('kingdom_id'), pet.data) for pet in self.pets.items.values()],
+        }
+        for category, items in owned_items.items():
+            for kingdom_id, item in items:
+                release_dates = self.kingdom_release_dates.setdefault(kingdom_id, {}).setdefault(category, [])
+                release_dates.append(item.get('release_date', datetime.datetime.min))
+        for release_dates in self.kingdom_release_dates.values():
+            for dates in release_dates.values():
+                dates.sort()
+        self.update_max_power_levels(datetime.datetime.now())
+
+    def update_max_power_levels(self, now):
+        max_power_levels = {}
         for kingdom in self.kingdoms.values():
             max_kingdom_level = 0
-            for task in self.user_data['pTasksData']['Kingdom']:
-                match = pattern.match(task['Id'])
-                if not match:
-                    print(f'Match is broken for kingdom {kingdom}')
-                level = match.groups()[0]
-                if not self.kingdom_satisfies_task(kingdom, task):
+            for level, task in self.kingdom_tasks:
+                if not self.kingdom_satisfies_task(kingdom, task, now):
                     break
-                max_kingdom_level = int(level)
-            self.kingdoms[kingdom['id']]['max_power_level'] = max_kingdom_level
-
-    def kingdom_satisfies_task(self, kingdom, task):
-        def has_enough(items):
-            items = [i for i in items.values() if i.get('kingdom_id') == kingdom['id']]
-            items = [i for i in items if 'release_date' not in i or i['release_date'] <= datetime.datetime.now()]
-            return len(items) >= task['XValue']
-
+                max_kingdom_level = level
+            max_power_levels[kingdom['id']] = max_kingdom_level
+        upcoming = [dates[bisect.bisect_right(dates, now)]
+                    for release_dates in self.kingdom_release_dates.values()
+                    for dates in release_dates.values() if dates[-1] > now]
+        self.max_power_levels = max_power_levels
+        self.max_power_levels_valid_until = min(upcoming, default=datetime.datetime.max)
+
+    def get_max_power_level(self, kingdom_id):
+        now = datetime.datetime.now()
+        if now >= self.max_power_levels_valid_until:
+            self.update_max_power_levels(now)
+        return self.max_power_levels.get(kingdom_id, 0)
+
+    def count_released(self, kingdom_id, category, now):
+        release_dates = self.kingdom_release_dates.get(kingdom_id, {}).get(category, [])
+        return bisect.bisect_right(release_dates, now)
+
+    def kingdom_satisfies_task(self, kingdom, task, now):
         if task['Task'] in ('IncreaseKingdomLevel', 'CompleteQuestline', 'Complete{x}ChallengesIn{y}'):
             return True
-        if task['Task'] == 'Own{x}Troops':
-            return has_enough(self.troops)
-        if task['Task'] == 'Own{x}Weapons':
-            return has_enough(self.weapons)
-        if task['Task'] == 'Own{x}Classes':
-            return has_enough(self.classes)
-        if task['Task'] == 'Own{x}Pets':
-            return has_enough(self.pets)
+        if task['Task'] in KINGDOM_TASK_CATEGORIES:
+            return self.count_released(kingdom['id'], KINGDOM_TASK_CATEGORIES[task['Task']], now) >= task['XValue']
         if task['Task'] == 'Earn{x}Renown':
             return kingdom['linked_kingdom_id'] and not kingdom['underworld']
         return False
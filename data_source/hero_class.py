@@ -1,2 +1,11 @@
-class HeroClass:
-    pass
+from data_source.entity import COLOR_CODES, Entity, TYPE_CODES
+
+
+class HeroClass(Entity):
+    __slots__ = ('id', 'name', 'code', 'talents', 'trees', 'traits', 'weapon_id', 'kingdom_id', 'type',
+                 'magic_color', 'weapon_color', 'release_date', 'traitstones')
+    ENUMS = {
+        'type': TYPE_CODES,
+        'magic_color': COLOR_CODES,
+        'weapon_color': COLOR_CODES,
+    }
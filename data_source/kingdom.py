@@ -1,2 +1,12 @@
-class Kingdom:
-    pass
+from data_source.entity import COLOR_CODES, Entity, TYPE_CODES
+
+
+class Kingdom(Entity):
+    __slots__ = ('id', 'name', 'description', 'punchline', 'underworld', 'location', 'troop_ids', 'weapon_ids',
+                 'troop_type', 'linked_kingdom_id', 'colors', 'filename', 'reference_name', 'class_id',
+                 'release_date', 'primary_color', 'primary_stat', 'pet', 'event_weapon')
+    ENUMS = {
+        'colors': COLOR_CODES,
+        'primary_color': COLOR_CODES,
+        'troop_type': TYPE_CODES,
+    }
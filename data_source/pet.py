@@ -15,8 +15,7 @@ EFFECTS = (
 
 
 class Pet(BaseGameData):
-    def set_effect_data(self, value):
-        self.data['effect_data'] = value
+    pass
 
 
 class PetContainer(BaseGameDataContainer):
@@ -41,7 +40,6 @@ class PetContainer(BaseGameDataContainer):
             'kingdom_title': '[KINGDOM]',
         }
         self.populate_effect_data()
-        self.translate()
 
     def populate_effect_data(self):
         effect = self.data['effect']
@@ -67,5 +65,4 @@ class PetContainer(BaseGameDataContainer):
         if self.data['effect'] == '[PETTYPE_BUFFTEAMKINGDOM]' \
                 and self.is_untranslated(self.translations['en'].effect_data) \
                 and str(kingdom_id) in self.translations['en'].effect_data:
-            for pet in self.translations.values():
-                pet.set_effect_data(kingdom_reference_name)
+            self.set_override('effect_data', kingdom_reference_name)
@@ -1,4 +1,13 @@
+from data_source.entity import COLOR_CODES, Entity, RARITY_CODES, ROLE_CODES, TYPE_CODES
 
-class Weapon:
-    def __init__(self):
-        pass
+
+class Weapon(Entity):
+    __slots__ = ('id', 'name', 'description', 'colors', 'rarity', 'type', 'roles', 'spell_id', 'kingdom',
+                 'requirement', 'armor_increase', 'attack_increase', 'health_increase', 'magic_increase', 'affixes',
+                 'class', 'release_date', 'event_faction')
+    ENUMS = {
+        'colors': COLOR_CODES,
+        'rarity': RARITY_CODES,
+        'type': TYPE_CODES,
+        'roles': ROLE_CODES,
+    }
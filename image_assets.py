@@ -0,0 +1,102 @@
+import asyncio
+
+import aiohttp
+import requests
+from wand.image import Image
+from wand.version import QUANTUM_DEPTH
+
+from base_bot import log
+from caches import DiskLRUCache, LRUCache
+from configurations import CONFIG
+from metrics import METRICS
+
+PREFETCH_CONCURRENCY = 8
+
+
+def get_image_bytes(img):
+    # ImageMagick holds four channels per pixel at its quantum depth, whatever the size of the file was
+    return img.width * img.height * 4 * QUANTUM_DEPTH // 8
+
+
+DISK_CACHE = DiskLRUCache(CONFIG.get('image_cache_folder'), CONFIG.get('image_cache_megabytes') * 1024 * 1024)
+# decoded images live per process, render workers keep theirs between jobs
+IMAGE_CACHE = LRUCache(CONFIG.get('image_memory_cache_megabytes') * 1024 * 1024, weigh=get_image_bytes)
+
+
+def get_url(path):
+    return f'{CONFIG.get("graphics_url")}/{path}'
+
+
+def get_disk_key(path):
+    return path.replace('/', '__')
+
+
+def download(path):
+    """Blocking, meant for render workers. Images missed by `prefetch` are fetched here as a last resort."""
+    key = get_disk_key(path)
+    data = DISK_CACHE.get(key)
+    if data is None:
+        log.warning(f'Image {path} was not prefetched, downloading it inside the render worker.')
+        r = requests.get(get_url(path), timeout=CONFIG.get('image_download_timeout_seconds'))
+        r.raise_for_status()
+        data = r.content
+        DISK_CACHE.set(key, data)
+        METRICS.increment('image_downloads')
+        METRICS.increment('image_worker_downloads')
+    return data
+
+
+async def prefetch(paths):
+    missing = {path for path in paths if get_disk_key(path) not in DISK_CACHE}
+    if not missing:
+        return
+    slots = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+    async def fetch(session, path):
+        async with slots:
+            try:
+                async with session.get(get_url(path)) as response:
+                    response.raise_for_status()
+                    data = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # the renderer will try again on its own
+                log.warning(f'Could not prefetch image {path}: {e!r}')
+                return
+        DISK_CACHE.set(get_disk_key(path), data)
+        METRICS.increment('image_downloads')
+
+    timeout = aiohttp.ClientTimeout(total=CONFIG.get('image_download_timeout_seconds'))
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await asyncio.gather(*[fetch(session, path) for path in missing])
+
+
+def scale_down(width, height, max_size):
+    ratio = width / height
+    if width > height:
+        return max_size, round(max_size / ratio)
+    else:
+        return round(ratio * max_size), max_size
+
+
+def decode(path, height=None, max_size=None, local=False):
+    if local:
+        img = Image(filename=path)
+    else:
+        img = Image(blob=download(path))
+        img.alpha_channel = True
+    if height:
+        ratio = img.width / img.height
+        img.resize(round(height * ratio), height)
+    elif max_size:
+        img.resize(*scale_down(img.width, img.height, max_size))
+    return img
+
+
+def get_image(path, height=None, max_size=None, local=False):
+    """Returns a private copy of a decoded image, resized to the given height or to fit max_size if asked."""
+    key = (path, height, max_size)
+    img = IMAGE_CACHE.get(key)
+    if img is None:
+        img = decode(path, height, max_size, local)
+        IMAGE_CACHE.set(key, img)
+    return img.clone()
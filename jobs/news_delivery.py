@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+import time
+from collections import defaultdict
+
+import discord
+
+from base_bot import log
+from configurations import CONFIG
+from metrics import METRICS
+from models.news_queue import NewsQueue
+
+
+class TokenBucket:
+    """Allows `rate` requests per `per` seconds, waiting for the bucket to refill instead of running into a 429."""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+
+
+class NewsDelivery:
+    # discord allows 50 requests per second per bot, and 5 messages per 5 seconds in a channel
+    GLOBAL_RATE = (50, 1)
+    CHANNEL_RATE = (5, 5)
+    # outcomes are written in batches, a crash can only cause this many duplicate messages
+    FLUSH_SIZE = 50
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.running = False
+        self.results = []
+        self.global_bucket = TokenBucket(*self.GLOBAL_RATE)
+        self.channel_buckets = defaultdict(lambda: TokenBucket(*self.CHANNEL_RATE))
+
+    async def deliver_pending(self, client):
+        """Delivers everything that is still pending, including deliveries interrupted by a restart."""
+        if self.running:
+            return
+        self.running = True
+        try:
+            await self.run(client)
+        finally:
+            self.running = False
+
+    async def run(self, client):
+        start = time.time()
+        by_channel = defaultdict(list)
+        for delivery in NewsQueue.get_pending():
+            by_channel[delivery['channel_id']].append(delivery)
+        if not by_channel:
+            return
+        log.debug(f'Delivering {sum(len(d) for d in by_channel.values())} news articles to '
+                  f'{len(by_channel)} channels.')
+        slots = asyncio.Semaphore(self.concurrency)
+        embeds = {}
+        sent = 0
+        total = 0
+
+        async def deliver_to_channel(channel_id, deliveries):
+            nonlocal sent, total
+            async with slots:
+                # articles of a single channel are sent in order, channels are served concurrently
+                for delivery in deliveries:
+                    try:
+                        result = await self.deliver(client, channel_id, delivery, embeds)
+                    except Exception as e:
+                        # e.g. the permission check or rendering failed, the next run tries again
+                        log.error(f'Could not deliver news to {channel_id}, exception follows')
+                        log.exception(e)
+                        METRICS.increment('news_delivery_failures')
+                        result = delivery, repr(e), False
+                    sent += result[1] is None
+                    total += 1
+                    self.results.append(result)
+                    if len(self.results) >= self.FLUSH_SIZE:
+                        await self.flush()
+
+        try:
+            # every channel runs to its end, results must not be added after the final flush
+            errors = await asyncio.gather(*[deliver_to_channel(channel_id, deliveries)
+                                            for channel_id, deliveries in by_channel.items()],
+                                          return_exceptions=True)
+        finally:
+            await self.flush()
+        for error in errors:
+            if isinstance(error, Exception):
+                log.error('News delivery to a channel stopped early, exception follows')
+                log.exception(error)
+        await NewsQueue.prune()
+
+        duration = time.time() - start
+        METRICS.observe('news_delivery_seconds', duration)
+        METRICS.observe('news_deliveries_per_second', sent / max(duration, 0.001))
+        log.debug(f'Delivered {sent} of {total} news articles in {duration:.2f} seconds.')
+
+    async def flush(self):
+        results, self.results = self.results, []
+        if results:
+            await NewsQueue.finish(results)
+
+    async def deliver(self, client, channel_id, delivery, embeds):
+        """Returns a (delivery, error, permanent) tuple, error is None on success."""
+        article = delivery['article']
+        channel = client.get_channel(channel_id)
+        if not await client.is_writable(channel):
+            message = 'is not writable' if channel else 'does not exist'
+            log.debug(f'News channel {channel_id} {message}.')
+            METRICS.increment('news_delivery_failures')
+            return delivery, f'Channel {message}.', True
+        if delivery['article_id'] not in embeds:
+            embeds[delivery['article_id']] = client.views.render_news(article)
+        log.debug(f'Sending [{article["platform"]}] {article["title"]} to {channel.guild.name}/{channel.name}.')
+        try:
+            for e in embeds[delivery['article_id']]:
+                await self.channel_buckets[channel_id].acquire()
+                await self.global_bucket.acquire()
+                await channel.send(embed=e)
+        except Exception as ex:
+            log.error(f'Could not send news to {channel_id}, exception follows')
+            log.exception(ex)
+            METRICS.increment('news_delivery_failures')
+            permanent = isinstance(ex, (discord.Forbidden, discord.NotFound))
+            return delivery, repr(ex), permanent
+        METRICS.increment('news_deliveries')
+        METRICS.observe('news_delivery_lag_seconds', (datetime.datetime.utcnow() - delivery['created']).total_seconds())
+        return delivery, None, False
+
+
+NEWS_DELIVERY = NewsDelivery(CONFIG.get('news_delivery_concurrency'))
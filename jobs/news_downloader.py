@@ -1,47 +1,99 @@
+import asyncio
 import datetime
 import html
 import json
 import os
 import re
 import time
-from io import BytesIO
 
+import aiohttp
 import feedparser
 import html2markdown
-import requests
-from PIL import Image
+from PIL import ImageFile
 from bs4 import BeautifulSoup
 
 from base_bot import log
+from caches import LRUCache
+
+SESSION = None
+# image url -> width / height, images behind an url do not change
+IMAGE_RATIOS = LRUCache(1000)
+PENDING_PROBES = {}
+# enough for the headers of nearly all png, gif and jpeg images
+PROBE_BYTES = 64 * 1024
+
+
+def get_session():
+    global SESSION
+    if SESSION is None or SESSION.closed:
+        SESSION = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60))
+    return SESSION
+
+
+async def read_image_size(source, headers=None):
+    parser = ImageFile.Parser()
+    async with get_session().get(source, headers=headers) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(4096):
+            parser.feed(chunk)
+            if parser.image:
+                return parser.image.size, response.status
+    return None, response.status
+
+
+async def probe_image_ratio(source):
+    size, status = await read_image_size(source, headers={'Range': f'bytes=0-{PROBE_BYTES - 1}'})
+    if size is None and status == 206:
+        size, status = await read_image_size(source)
+    if size is None:
+        raise ValueError(f'Could not determine the image size of {source}.')
+    return size[0] / size[1]
+
+
+async def get_image_ratio(source):
+    ratio = IMAGE_RATIOS.get(source)
+    if ratio is not None:
+        return ratio
+    # posts are processed concurrently and often share images, those are probed only once
+    if source not in PENDING_PROBES:
+        PENDING_PROBES[source] = asyncio.ensure_future(probe_image_ratio(source))
+    try:
+        ratio = await asyncio.shield(PENDING_PROBES[source])
+    finally:
+        probe = PENDING_PROBES.get(source)
+        if probe is not None and probe.done():
+            del PENDING_PROBES[source]
+    IMAGE_RATIOS.set(source, ratio)
+    return ratio
 
 
 class NewsDownloader:
     LAST_POST_DATE_FILENAME = 'jobs/latest_known_post.dat'
     NEWS_FILENAME = 'jobs/posts.json'
     GOW_FEED_URL = 'https://gemsofwar.com/feed/'
+    # ETag and Last-Modified of the last feed download, shared by all downloaders
+    feed_validators = {}
 
     def __init__(self):
         self.last_post_date = datetime.datetime.min
         self.get_last_post_date()
 
     @staticmethod
-    def is_banner(source):
-        request = requests.get(source)
-        image = Image.open(BytesIO(request.content))
-        size = image.size
-        ratio = size[0] / size[1]
+    async def is_banner(source):
+        try:
+            ratio = await get_image_ratio(source)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            log.warning(f'[NEWS] Could not probe {source}: {e!r}')
+            return False
         arbitrary_ratio_limit_for_banners = 10
         log.debug(f'[NEWS] Found a ration of {ratio} in {source}.')
         return ratio >= arbitrary_ratio_limit_for_banners
 
-    def remove_tags(self, text):
+    async def remove_tags(self, text):
         soup = BeautifulSoup(text, 'html5lib')
-        source_images = soup.findAll('img')
-        images = []
-        for i in source_images:
-            source = i['src']
-            if not self.is_banner(source):
-                images.append(source)
+        sources = [i['src'] for i in soup.findAll('img')]
+        banners = await asyncio.gather(*[self.is_banner(source) for source in sources])
+        images = [source for source, banner in zip(sources, banners) if not banner]
 
         forbidden_tags = re.compile(r'</?(a|img|div).*?>')
         tags_removed = re.sub(forbidden_tags, '', text) \
@@ -49,9 +101,9 @@ class NewsDownloader:
             .replace('</em>', '</em> ')
         return images, html.unescape(html2markdown.convert(tags_removed))
 
-    def reformat_html_summary(self, e):
+    async def reformat_html_summary(self, e):
         content = e['content'][0]['value']
-        images, tags_removed = self.remove_tags(content)
+        images, tags_removed = await self.remove_tags(content)
         return images, tags_removed.strip()
 
     def get_last_post_date(self):
@@ -59,20 +111,37 @@ class NewsDownloader:
             with open(self.LAST_POST_DATE_FILENAME) as f:
                 self.last_post_date = datetime.datetime.fromisoformat(f.read().strip())
 
-    def process_news_feed(self):
-        url = f'{self.GOW_FEED_URL}?{int(time.time())}'
-        feed = feedparser.parse(url)
+    async def download_feed(self):
+        async with get_session().get(self.GOW_FEED_URL, headers=self.feed_validators) as response:
+            if response.status == 304:
+                return None, self.feed_validators
+            response.raise_for_status()
+            content = await response.read()
+            validators = {}
+            if 'ETag' in response.headers:
+                validators['If-None-Match'] = response.headers['ETag']
+            if 'Last-Modified' in response.headers:
+                validators['If-Modified-Since'] = response.headers['Last-Modified']
+        return feedparser.parse(content), validators
+
+    async def process_news_feed(self):
+        feed, validators = await self.download_feed()
+        if feed is None:
+            return
         new_last_post_date = self.last_post_date
 
-        posts = []
+        new_entries = []
         for entry in feed['entries']:
-            platform = 'switch' if 'Nintendo Switch' in entry.title else 'pc'
-
             posted_date = datetime.datetime.fromtimestamp(time.mktime(entry.published_parsed))
             if posted_date <= self.last_post_date:
                 continue
+            new_entries.append(entry)
+            new_last_post_date = max(new_last_post_date, posted_date)
 
-            images, content = self.reformat_html_summary(entry)
+        summaries = await asyncio.gather(*[self.reformat_html_summary(entry) for entry in new_entries])
+        posts = []
+        for entry, (images, content) in zip(new_entries, summaries):
+            platform = 'switch' if 'Nintendo Switch' in entry.title else 'pc'
             posts.append({
                 'author': entry.author,
                 'title': entry.title,
@@ -81,7 +150,6 @@ class NewsDownloader:
                 'images': images,
                 'platform': platform,
             })
-            new_last_post_date = max(new_last_post_date, posted_date)
 
         if posts:
             with open('jobs/posts.json', 'w') as f:
@@ -89,3 +157,5 @@ class NewsDownloader:
 
             with open(self.LAST_POST_DATE_FILENAME, 'w') as f:
                 f.write(new_last_post_date.isoformat())
+        # only skip unchanged feeds once all posts from this one are safely stored
+        NewsDownloader.feed_validators = validators
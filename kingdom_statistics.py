@@ -0,0 +1,67 @@
+import datetime
+
+import numpy as np
+
+HIDDEN_KINGDOMS = (3032, 3033, 3034, 3038)
+FILTERS = ('colors', 'types', 'roles', 'rarity')
+
+
+class KingdomStatistics:
+    def __init__(self, kingdoms, troops):
+        self.kingdom_ids = [kingdom['id'] for kingdom in kingdoms.values()
+                            if kingdom['location'] == 'krystara' and kingdom['id'] not in HIDDEN_KINGDOMS]
+        kingdom_troops = [(i, troops[troop_id])
+                          for i, kingdom_id in enumerate(self.kingdom_ids)
+                          for troop_id in kingdoms[kingdom_id]['troop_ids']]
+
+        self.troop_kingdoms = np.zeros((len(self.kingdom_ids), len(kingdom_troops)))
+        for row, (kingdom_index, troop) in enumerate(kingdom_troops):
+            self.troop_kingdoms[kingdom_index, row] = 1
+        self.release_dates = np.array(
+            [troop.get('release_date', datetime.datetime.min) for _, troop in kingdom_troops],
+            dtype='datetime64[us]')
+
+        self.columns = {}
+        self.features = {}
+        for filter_name in FILTERS:
+            troop_values = [self.as_list(troop.get(filter_name)) for _, troop in kingdom_troops]
+            columns = sorted({value for values in troop_values for value in values})
+            self.columns[filter_name] = {value: i for i, value in enumerate(columns)}
+            features = np.zeros((len(kingdom_troops), len(columns)))
+            for row, values in enumerate(troop_values):
+                for value in values:
+                    features[row, self.columns[filter_name][value]] = 1
+            self.features[filter_name] = features
+
+    @staticmethod
+    def as_list(value):
+        if value is None:
+            return []
+        if isinstance(value, list):
+            return value
+        return [value]
+
+    def top_kingdoms(self, filter_name, filter_values, now):
+        available = self.release_dates <= np.datetime64(now)
+        totals = self.troop_kingdoms @ available
+        fitting = self.troop_kingdoms @ (self.features[filter_name] * available[:, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentages = np.where(totals[:, None] > 0, fitting / totals[:, None], -1)
+        top_rows = percentages.argmax(axis=0)
+
+        result = {}
+        for filter_ in filter_values:
+            column = self.columns[filter_name].get(filter_)
+            if column is None:
+                row = int(np.argmax(totals > 0))
+                fitting_troops = 0
+            else:
+                row = top_rows[column]
+                fitting_troops = int(fitting[row, column])
+            result[filter_] = {
+                'kingdom_id': self.kingdom_ids[row],
+                'total': int(totals[row]),
+                'fitting_troops': fitting_troops,
+                'percentage': fitting_troops / int(totals[row]),
+            }
+        return result
@@ -0,0 +1,95 @@
+import asyncio
+import bisect
+import threading
+
+
+class Metric:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+        self.last = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        self.last = value
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'max': self.maximum,
+            'last': self.last,
+        }
+
+
+class Histogram(Metric):
+    def __init__(self, buckets):
+        super().__init__()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+
+    def observe(self, value):
+        super().observe(value)
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+
+    def as_dict(self):
+        result = super().as_dict()
+        result['buckets'] = dict(zip([f'<={bucket}' for bucket in self.buckets] + ['+Inf'], self.counts))
+        return result
+
+
+class Metrics:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self.lock:
+            self.metrics.setdefault(name, Metric()).observe(value)
+
+    def observe_histogram(self, name, value, buckets):
+        with self.lock:
+            self.metrics.setdefault(name, Histogram(buckets)).observe(value)
+
+    def increment(self, name, amount=1):
+        self.observe(name, amount)
+
+    def get(self, name):
+        with self.lock:
+            if name not in self.metrics:
+                return Metric().as_dict()
+            return self.metrics[name].as_dict()
+
+    def as_dict(self):
+        with self.lock:
+            return {name: metric.as_dict() for name, metric in sorted(self.metrics.items())}
+
+
+METRICS = Metrics()
+
+
+class LoopStallMonitor:
+    def __init__(self, metric_name, interval=0.05):
+        self.metric_name = metric_name
+        self.interval = interval
+        self.max_stall = 0
+        self.task = None
+
+    async def watch(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            stall = max(0, loop.time() - start - self.interval)
+            self.max_stall = max(self.max_stall, stall)
+
+    async def __aenter__(self):
+        self.task = asyncio.ensure_future(self.watch())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.task.cancel()
+        METRICS.observe(self.metric_name, self.max_stall)
@@ -1,6 +1,4 @@
-import asyncio
-
-from models.db import DB
+from models.db import DB, DB_WRITER, staged
 
 
 class BaseGuildStorage:
@@ -17,19 +15,14 @@ class BaseGuildStorage:
         db.close()
 
     async def set(self, guild, value):
-        self.__data[guild.id] = value
-        lock = asyncio.Lock()
-        async with lock:
-            db = DB()
-            query = f"""
-            INSERT INTO {self.table} (guild_id, value)
-              VALUES (?, ?)
-              ON CONFLICT (guild_id)
-              DO UPDATE SET value=?;
-            """
-            db.cursor.execute(query, (guild.id, value, value))
-            db.commit()
-            db.close()
+        query = f"""
+        INSERT INTO {self.table} (guild_id, value)
+          VALUES (?, ?)
+          ON CONFLICT (guild_id)
+          DO UPDATE SET value=?;
+        """
+        with staged(self.__data, guild.id, value):
+            await DB_WRITER.execute(query, (guild.id, value, value))
 
     def get(self, guild):
         if guild is None:
@@ -1,9 +1,8 @@
-import asyncio
 import datetime
 
 from hashids import Hashids
 
-from models import DB
+from models import DB, DB_WRITER, staged
 
 MAX_BOOKMARKS = 10
 
@@ -51,11 +50,8 @@ class Bookmark:
             'team_code': team_code,
             'created': datetime.datetime.utcnow(),
         }
-        lock = asyncio.Lock()
-        async with lock:
-            self.bookmarks[_id] = bookmark
-            db = DB()
-            db.cursor.execute(
+        with staged(self.bookmarks, _id, bookmark):
+            await DB_WRITER.execute(
                 'REPLACE INTO Bookmark (id, author_id, author_name, description, team_code) '
                 'VALUES (?, ?, ?, ?, ?)',
                 (_id,
@@ -64,8 +60,6 @@ class Bookmark:
                  description,
                  team_code,
                  ))
-            db.commit()
-            db.close()
         return _id
 
     async def remove(self, author_id, bookmark_id):
@@ -73,13 +67,8 @@ class Bookmark:
             raise BookmarkError('The bookmark you are trying to delete does not exist.')
         elif str(author_id) != self.bookmarks[bookmark_id]['author_id']:
             raise BookmarkError('The bookmark you are trying to delete belongs to someone else.')
-        lock = asyncio.Lock()
-        async with lock:
-            db = DB()
-            db.cursor.execute('DELETE FROM Bookmark WHERE id = ?', (bookmark_id,))
-            db.commit()
-            db.close()
-            del (self.bookmarks[bookmark_id])
+        with staged(self.bookmarks, bookmark_id):
+            await DB_WRITER.execute('DELETE FROM Bookmark WHERE id = ?', (bookmark_id,))
 
     def get_my_bookmarks(self, author_id):
         return [t for t in self.bookmarks.values() if str(author_id) == t['author_id']]
@@ -1,9 +1,35 @@
+import asyncio
+import atexit
+import contextlib
+import os
+import queue
 import sqlite3
+import threading
+import time
 
 from configurations import CONFIG
+from metrics import METRICS
 
 
 class DB:
+    """
+    Cheap handle on a long-lived connection. Each thread (and forked process) keeps one connection per database
+    file, `close` only releases the cursor while the connection stays open until `close_all` runs at exit.
+    """
+    CACHED_STATEMENTS = 256
+    SCHEMA_FILE = os.path.join(os.path.dirname(__file__), 'schema.sql')
+    BUSY_TIMEOUT_MS = 5000
+    PRAGMAS = [
+        'PRAGMA journal_mode=WAL;',
+        # with WAL a crash can only lose the last transactions, never corrupt the database
+        'PRAGMA synchronous=NORMAL;',
+        f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS};',
+    ]
+
+    local = threading.local()
+    connections = []
+    lock = threading.Lock()
+
     def __init__(self):
         self.filename = CONFIG.get('database')
         self.conn = None
@@ -11,12 +37,173 @@ class DB:
         self.connect()
 
     def connect(self):
-        self.conn = sqlite3.connect(self.filename, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-        self.conn.row_factory = sqlite3.Row
+        self.conn = self.get_connection(self.filename)
         self.cursor = self.conn.cursor()
 
+    @classmethod
+    def get_connection(cls, filename):
+        if getattr(cls.local, 'pid', None) != os.getpid():
+            # connections must not be shared with a forked child
+            cls.local.pid = os.getpid()
+            cls.local.connections = {}
+        conn = cls.local.connections.get(filename)
+        if conn is None:
+            conn = sqlite3.connect(filename, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                                   cached_statements=cls.CACHED_STATEMENTS, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for pragma in cls.PRAGMAS:
+                conn.execute(pragma)
+            cls.local.connections[filename] = conn
+            with cls.lock:
+                cls.connections.append((os.getpid(), conn))
+        return conn
+
+    @classmethod
+    def create_schema(cls):
+        """Creates missing tables and indexes, so new tables also show up in existing databases."""
+        with open(cls.SCHEMA_FILE) as f:
+            cls.get_connection(CONFIG.get('database')).executescript(f.read())
+
     def commit(self):
         self.conn.commit()
 
     def close(self):
-        self.conn.close()
+        self.cursor.close()
+
+    @classmethod
+    def close_all(cls):
+        with cls.lock:
+            connections, cls.connections = cls.connections, []
+        for pid, conn in connections:
+            if pid == os.getpid():
+                conn.close()
+        cls.local = threading.local()
+
+
+class DBWriter:
+    """
+    Single writer thread owning its own connection. Writes are queued from the event loop and everything that
+    piles up while a transaction commits goes into the next one, so many writes share a single fsync.
+    """
+    MAX_BATCH = 200
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.work, name='db-writer', daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        """Writes everything still queued, then ends the thread."""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def run(self, operation):
+        """Runs operation(cursor) inside the writer thread and returns a future of its result."""
+        self.start()
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self.queue.put((operation, loop, future))
+        return future
+
+    def execute(self, query, params=()):
+        return self.run(lambda cursor: cursor.execute(query, params).rowcount)
+
+    def executemany(self, query, params):
+        return self.run(lambda cursor: cursor.executemany(query, params).rowcount)
+
+    def work(self):
+        conn = DB.get_connection(CONFIG.get('database'))
+        # transactions are handled explicitly, one per batch
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.MAX_BATCH and not self.queue.empty():
+                batch.append(self.queue.get())
+            if None in batch:
+                running = False
+                batch = [job for job in batch if job is not None]
+            if not batch:
+                continue
+            try:
+                self.commit(cursor, batch)
+            except Exception as e:
+                # e.g. the database stayed locked beyond the busy timeout, nothing of this batch was written
+                if cursor.connection.in_transaction:
+                    cursor.execute('ROLLBACK')
+                self.notify([(loop, future, None, e) for _, loop, future in batch])
+
+    def commit(self, cursor, batch):
+        start = time.time()
+        results = []
+        cursor.execute('BEGIN')
+        for operation, loop, future in batch:
+            # a failing write only rolls back itself, not the rest of the batch
+            cursor.execute('SAVEPOINT operation')
+            try:
+                results.append((loop, future, operation(cursor), None))
+                cursor.execute('RELEASE operation')
+            except Exception as e:
+                cursor.execute('ROLLBACK TO operation')
+                cursor.execute('RELEASE operation')
+                results.append((loop, future, None, e))
+        cursor.execute('COMMIT')
+        METRICS.observe('db_group_commit_size', len(batch))
+        METRICS.observe('db_commit_seconds', time.time() - start)
+        self.notify(results)
+
+    def notify(self, results):
+        for loop, future, result, error in results:
+            try:
+                loop.call_soon_threadsafe(self.resolve, future, result, error)
+            except RuntimeError:
+                # the loop that asked for this write is gone, nobody is waiting for the result any more
+                pass
+
+    @staticmethod
+    def resolve(future, result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+REMOVED = object()
+
+
+def set_entry(mapping, key, value):
+    if value is REMOVED:
+        mapping.pop(key, None)
+    else:
+        mapping[key] = value
+
+
+@contextlib.contextmanager
+def staged(mapping, key, value=REMOVED):
+    """
+    Changes mapping[key] (or removes it) ahead of the write queued inside the block. If that write fails, the old
+    entry is put back unless another change has replaced ours in the meantime.
+    """
+    previous = mapping.get(key, REMOVED)
+    set_entry(mapping, key, value)
+    try:
+        yield
+    except Exception:
+        if mapping.get(key, REMOVED) is value:
+            set_entry(mapping, key, previous)
+        raise
+
+
+DB_WRITER = DBWriter()
+atexit.register(DB.close_all)
+atexit.register(DB_WRITER.stop)
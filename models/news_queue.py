@@ -0,0 +1,74 @@
+import datetime
+import json
+
+from models import DB, DB_WRITER
+
+
+class NewsQueue:
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    MAX_ATTEMPTS = 3
+    KEEP_DAYS = 7
+
+    @staticmethod
+    async def add(articles, subscriptions):
+        """Stores new articles together with one pending delivery per subscribed channel, in one transaction."""
+        subscriptions = list(subscriptions)
+
+        def insert(cursor):
+            for article in articles:
+                cursor.execute('INSERT OR IGNORE INTO NewsArticle (url, platform, article) VALUES (?, ?, ?)',
+                               (article['url'], article['platform'], json.dumps(article)))
+                if not cursor.rowcount:
+                    continue
+                article_id = cursor.lastrowid
+                cursor.executemany('INSERT OR IGNORE INTO NewsDelivery (article_id, channel_id) VALUES (?, ?)',
+                                   [(article_id, s['channel_id']) for s in subscriptions if s.get(article['platform'])])
+
+        await DB_WRITER.run(insert)
+
+    @staticmethod
+    def get_pending():
+        db = DB()
+        db.cursor.execute('SELECT d.article_id, d.channel_id, d.attempts, a.article, a.created '
+                          'FROM NewsDelivery d JOIN NewsArticle a ON a.id = d.article_id '
+                          'WHERE d.status = ? ORDER BY d.article_id;', (NewsQueue.PENDING,))
+        deliveries = [{
+            'article_id': row['article_id'],
+            'channel_id': row['channel_id'],
+            'attempts': row['attempts'],
+            'article': json.loads(row['article']),
+            'created': row['created'],
+        } for row in db.cursor.fetchall()]
+        db.close()
+        return deliveries
+
+    @staticmethod
+    async def finish(results):
+        """Records the outcome of (delivery, error, permanent) tuples, failed deliveries are retried a few times."""
+        updates = []
+        for delivery, error, permanent in results:
+            attempts = delivery['attempts'] + 1
+            if error is None:
+                status = NewsQueue.SENT
+            elif permanent or attempts >= NewsQueue.MAX_ATTEMPTS:
+                status = NewsQueue.FAILED
+            else:
+                status = NewsQueue.PENDING
+            updates.append((status, attempts, error, datetime.datetime.utcnow() if error is None else None,
+                            delivery['article_id'], delivery['channel_id']))
+        await DB_WRITER.executemany('UPDATE NewsDelivery SET status = ?, attempts = ?, error = ?, delivered = ? '
+                                    'WHERE article_id = ? AND channel_id = ?;', updates)
+
+    @staticmethod
+    async def prune():
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=NewsQueue.KEEP_DAYS)
+        finished = 'SELECT id FROM NewsArticle WHERE created < ? AND id NOT IN ' \
+                   '(SELECT article_id FROM NewsDelivery WHERE status = ?)'
+
+        def delete(cursor):
+            cursor.execute(f'DELETE FROM NewsDelivery WHERE article_id IN ({finished});', (cutoff, NewsQueue.PENDING))
+            cursor.execute(f'DELETE FROM NewsArticle WHERE id IN ({finished});', (cutoff, NewsQueue.PENDING))
+
+        await DB_WRITER.run(delete)
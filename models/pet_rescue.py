@@ -1,11 +1,10 @@
-import asyncio
 import datetime
 import math
 
 import discord
 
 from base_bot import FakeMessage, log
-from models import DB
+from models import DB, DB_WRITER
 
 
 class PetRescue:
@@ -135,7 +134,6 @@ class PetRescue:
         return rescues
 
     async def add(self, pet_rescues):
-        db = DB()
         query = 'INSERT INTO PetRescue (guild_name, guild_id, channel_name, channel_id, message_id, pet_id, ' \
                 'alert_message_id, pet_message_id, start_time, lang, mention) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
         channel_type = self.message.channel.type
@@ -157,21 +155,17 @@ class PetRescue:
             self.lang,
             str(self.mention),
         ]
-        lock = asyncio.Lock()
-        async with lock:
-            db.cursor.execute(query, params)
-            db.commit()
-            pet_rescues.append(self)
+        pet_rescues.append(self)
+        try:
+            await DB_WRITER.execute(query, params)
+        except Exception:
+            pet_rescues.remove(self)
+            raise
 
     async def remove_from_db(self):
         await self.delete_by_id(message_id=self.message.id)
 
     @staticmethod
     async def delete_by_id(rescue_id=0, message_id=0):
-        lock = asyncio.Lock()
-        async with lock:
-            db = DB()
-            query = 'DELETE FROM PetRescue WHERE id = ? OR message_id = ?'
-            db.cursor.execute(query, [rescue_id, message_id])
-            db.commit()
-            db.close()
+        query = 'DELETE FROM PetRescue WHERE id = ? OR message_id = ?'
+        await DB_WRITER.execute(query, [rescue_id, message_id])
@@ -1,7 +1,6 @@
-import asyncio
 import discord
 
-from models import DB
+from models import DB, DB_WRITER, staged
 
 
 class PetRescueConfig:
@@ -16,20 +15,19 @@ class PetRescueConfig:
         self.__data = {}
 
     async def load(self):
-        lock = asyncio.Lock()
-        async with lock:
-            db = DB()
-            query = 'SELECT * FROM PetRescueConfig;'
-            db.cursor.execute(query)
-            self.__data = {
-                entry['channel_id']: {
-                    'mention': entry['mention'],
-                    'delete_mention': bool(entry['delete_mention']),
-                    'delete_message': bool(entry['delete_message']),
-                    'delete_pet': bool(entry['delete_pet']),
-                }
-                for entry in db.cursor.fetchall()
+        db = DB()
+        query = 'SELECT * FROM PetRescueConfig;'
+        db.cursor.execute(query)
+        self.__data = {
+            entry['channel_id']: {
+                'mention': entry['mention'],
+                'delete_mention': bool(entry['delete_mention']),
+                'delete_message': bool(entry['delete_message']),
+                'delete_pet': bool(entry['delete_pet']),
             }
+            for entry in db.cursor.fetchall()
+        }
+        db.close()
 
     def get(self, channel):
         return self.__data.get(channel.id, self.DEFAULT_CONFIG.copy())
@@ -53,42 +51,37 @@ class PetRescueConfig:
         def noop(x, _):
             return x
 
-        config = self.get(channel)
+        config = dict(self.get(channel))
         config[key] = translations.get(key, noop)(value, translated_trues)
         await self.set(guild, channel, config)
         return config
 
     async def set(self, guild, channel, config):
-        lock = asyncio.Lock()
-        async with lock:
-            self.__data[channel.id] = config
-            db = DB()
-            query = f"""
-            INSERT INTO PetRescueConfig (guild_name, guild_id, channel_name, channel_id, mention, delete_mention,
-             delete_message, delete_pet)
-              VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-              ON CONFLICT (guild_id, channel_id)
-              DO UPDATE SET guild_name=?, guild_id=?, channel_name=?, channel_id=?, mention=?, delete_mention=?,
-               delete_message=?, delete_pet=?;"""
-            channel_type = channel.type
-            if channel_type == discord.ChannelType.private:
-                guild_name = 'Private Message'
-                guild_id = 0
-                channel_name = channel.recipient.name
-            else:
-                guild_id = guild.id
-                guild_name = guild.name
-                channel_name = channel.name
-            params = [
-                guild_name,
-                guild_id,
-                channel_name,
-                channel.id,
-                config['mention'],
-                config['delete_mention'],
-                config['delete_message'],
-                config['delete_pet'],
-            ]
-            db.cursor.execute(query, (*params, *params))
-            db.commit()
-            db.close()
+        query = f"""
+        INSERT INTO PetRescueConfig (guild_name, guild_id, channel_name, channel_id, mention, delete_mention,
+         delete_message, delete_pet)
+          VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+          ON CONFLICT (guild_id, channel_id)
+          DO UPDATE SET guild_name=?, guild_id=?, channel_name=?, channel_id=?, mention=?, delete_mention=?,
+           delete_message=?, delete_pet=?;"""
+        channel_type = channel.type
+        if channel_type == discord.ChannelType.private:
+            guild_name = 'Private Message'
+            guild_id = 0
+            channel_name = channel.recipient.name
+        else:
+            guild_id = guild.id
+            guild_name = guild.name
+            channel_name = channel.name
+        params = [
+            guild_name,
+            guild_id,
+            channel_name,
+            channel.id,
+            config['mention'],
+            config['delete_mention'],
+            config['delete_message'],
+            config['delete_pet'],
+        ]
+        with staged(self.__data, channel.id, config):
+            await DB_WRITER.execute(query, (*params, *params))
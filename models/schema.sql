@@ -67,7 +67,7 @@ CREATE TABLE IF NOT EXISTS PetRescueConfig
 );
 
 CREATE
-UNIQUE INDEX PetRescueConfig_index
+UNIQUE INDEX IF NOT EXISTS PetRescueConfig_index
     ON PetRescueConfig (guild_id, channel_id);
 
 CREATE TABLE IF NOT EXISTS Bookmark
@@ -78,4 +78,29 @@ CREATE TABLE IF NOT EXISTS Bookmark
     description TEXT NOT NULL,
     team_code   TEXT NOT NULL,
     created     TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-);
\ No newline at end of file
+);
+CREATE TABLE IF NOT EXISTS NewsArticle
+(
+    id       INTEGER CONSTRAINT NewsArticle_pk PRIMARY KEY AUTOINCREMENT,
+    url      TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    article  TEXT NOT NULL,
+    created  TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS NewsArticle_url_index
+    ON NewsArticle (url);
+
+CREATE TABLE IF NOT EXISTS NewsDelivery
+(
+    article_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    status     TEXT    NOT NULL DEFAULT 'pending',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    error      TEXT,
+    delivered  TIMESTAMP,
+    CONSTRAINT NewsDelivery_pk PRIMARY KEY (article_id, channel_id)
+);
+
+CREATE INDEX IF NOT EXISTS NewsDelivery_status_index
+    ON NewsDelivery (status);
@@ -1,6 +1,4 @@
-import asyncio
-
-from models import DB
+from models import DB, DB_WRITER, staged
 
 
 class Subscriptions:
@@ -42,37 +40,24 @@ class Subscriptions:
         return subscription_id, subscription
 
     async def add(self, guild, channel, platform):
-        s_id, subscription = self.get_subscription(guild, channel, platform)
+        s_id, s = self.get_subscription(guild, channel, platform)
         if s_id in self._subscriptions:
-            self._subscriptions[s_id][platform.lower()] = True
-        else:
-            self._subscriptions[s_id] = subscription
-        s = self._subscriptions[s_id]
-        lock = asyncio.Lock()
-        async with lock:
-            db = DB()
-            db.cursor.execute('REPLACE INTO Subscription (channel_id, guild_id, guild, channel, pc, switch) '
-                              'VALUES (?, ?, ?, ?, ?, ?)',
-                              (s['channel_id'],
-                               s['guild_id'],
-                               s['guild_name'],
-                               s['channel_name'],
-                               s.get('pc', False),
-                               s.get('switch', False),
-                               ))
-            db.commit()
-            db.close()
+            s = {**self._subscriptions[s_id], platform.lower(): True}
+        with staged(self._subscriptions, s_id, s):
+            await DB_WRITER.execute('REPLACE INTO Subscription (channel_id, guild_id, guild, channel, pc, switch) '
+                                    'VALUES (?, ?, ?, ?, ?, ?)',
+                                    (s['channel_id'],
+                                     s['guild_id'],
+                                     s['guild_name'],
+                                     s['channel_name'],
+                                     s.get('pc', False),
+                                     s.get('switch', False),
+                                     ))
 
     async def remove(self, guild, channel):
         s_id, subscription = self.get_subscription(guild, channel)
-        if self.is_subscribed(guild, channel):
-            del self._subscriptions[s_id]
-        lock = asyncio.Lock()
-        async with lock:
-            db = DB()
-            db.cursor.execute('DELETE FROM Subscription WHERE channel_id = ?', (subscription['channel_id'],))
-            db.commit()
-            db.close()
+        with staged(self._subscriptions, s_id):
+            await DB_WRITER.execute('DELETE FROM Subscription WHERE channel_id = ?', (subscription['channel_id'],))
 
     def is_subscribed(self, guild, channel):
         subscription_id = self.get_subscription_id(guild, channel)
@@ -1,9 +1,8 @@
-import asyncio
 import datetime
 
 from hashids import Hashids
 
-from models import DB
+from models import DB, DB_WRITER, staged
 
 MAX_TOPLISTS = 5
 
@@ -60,11 +59,8 @@ class Toplist:
             'created': datetime.datetime.utcnow(),
             'modified': datetime.datetime.utcnow(),
         }
-        lock = asyncio.Lock()
-        async with lock:
-            self.toplists[_id] = toplist
-            db = DB()
-            db.cursor.execute(
+        with staged(self.toplists, _id, toplist):
+            await DB_WRITER.execute(
                 'REPLACE INTO Toplist (id, author_id, author_name, description, items, modified) '
                 'VALUES (?, ?, ?, ?, ?, ?)',
                 (_id,
@@ -74,8 +70,6 @@ class Toplist:
                  ','.join(chopped_items),
                  toplist['modified'],
                  ))
-            db.commit()
-            db.close()
         return _id
 
     async def remove(self, author_id, _id):
@@ -83,13 +77,8 @@ class Toplist:
             raise ToplistError('The toplist you are trying to delete does not exist.')
         elif str(author_id) != self.toplists[_id]['author_id']:
             raise ToplistError('The toplist you are trying to delete belongs to someone else.')
-        lock = asyncio.Lock()
-        async with lock:
-            db = DB()
-            db.cursor.execute('DELETE FROM Toplist WHERE id = ?', (_id,))
-            db.commit()
-            db.close()
-            del (self.toplists[_id])
+        with staged(self.toplists, _id):
+            await DB_WRITER.execute('DELETE FROM Toplist WHERE id = ?', (_id,))
 
     async def append(self, _id, author_id, author_name, new_items):
         if _id not in self.toplists:
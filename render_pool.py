@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+import time
+
+from configurations import CONFIG
+from metrics import METRICS
+
+DURATION_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+class RenderWorkerError(Exception):
+    """The job raised inside its worker, or its worker was terminated by a pool restart."""
+
+
+class RenderPool:
+    def __init__(self, size=1, queue_size=4, timeout=60):
+        self.size = size
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.pool = None
+        self.slots = None
+        self.waiting = 0
+        self.jobs = set()
+
+    def get_pool(self):
+        if self.pool is None:
+            # a fresh interpreter per worker, ImageMagick does not cope well with being forked
+            self.pool = multiprocessing.get_context('spawn').Pool(self.size)
+        return self.pool
+
+    def restart(self):
+        if self.pool is not None:
+            self.pool.terminate()
+        self.pool = None
+        for job in self.jobs:
+            if not job.done():
+                job.set_exception(RenderWorkerError('Render pool was restarted.'))
+
+    async def render(self, function, *args):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.size)
+        if self.waiting >= self.queue_size:
+            METRICS.increment('render_rejections')
+            raise RenderQueueFull(f'{self.waiting} render jobs are already waiting.')
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await self.run(function, args)
+        finally:
+            self.slots.release()
+
+    async def run(self, function, args):
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def set_result(result):
+            if not future.done():
+                future.set_result(result)
+
+        def set_exception(exception):
+            if not future.done():
+                error = RenderWorkerError(f'Render job failed: {exception!r}')
+                error.__cause__ = exception
+                future.set_exception(error)
+
+        start = time.time()
+        self.jobs.add(future)
+        self.get_pool().apply_async(function, args,
+                                    callback=lambda result: loop.call_soon_threadsafe(set_result, result),
+                                    error_callback=lambda e: loop.call_soon_threadsafe(set_exception, e))
+        try:
+            result = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            METRICS.increment('render_timeouts')
+            self.restart()
+            raise
+        except asyncio.CancelledError:
+            # a running job cannot be stopped on its own, the worker processes have to go
+            self.restart()
+            raise
+        finally:
+            self.jobs.discard(future)
+        METRICS.observe_histogram('render_seconds', time.time() - start, DURATION_BUCKETS)
+        return result
+
+
+RENDER_POOL = RenderPool(CONFIG.get('render_pool_size'), CONFIG.get('render_queue_size'),
+                         CONFIG.get('render_timeout_seconds'))
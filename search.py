@@ -1,16 +1,25 @@
 import copy
 import datetime
-import importlib
 import logging
 import operator
 import re
+import threading
+import time
+from collections import defaultdict
 
+import snapshot
 import translations
+from caches import LRUCache, ScheduledCache
+from configurations import CONFIG
+from data_source.entity import TranslatedView
 from data_source.game_data import GameData
 from game_constants import COLORS, EVENT_TYPES, RARITY_COLORS, SOULFORGE_REQUIREMENTS, TROOP_RARITIES, WEAPON_RARITIES
+from kingdom_statistics import KingdomStatistics
 from models.bookmark import Bookmark
 from models.toplist import Toplist
-from util import dig, extract_search_tag, format_locale_date, translate_day
+from search_index import SearchIndex
+from util import extract_search_tag, format_locale_date, translate_day
+from worker_pool import cpu_bound
 
 LOGLEVEL = logging.DEBUG
 
@@ -23,21 +32,23 @@ log = logging.getLogger(__name__)
 log.setLevel(LOGLEVEL)
 log.addHandler(handler)
 
-_ = translations.Translations().get
+_ = translations.translate
 
+SPELL_PLACEHOLDER = re.compile(r'\{\d\}')
+SPOILER_HORIZON = datetime.timedelta(days=180)
 
-def update_translations():
-    global _
-    importlib.reload(translations)
-    del _
-    _ = translations.Translations().get
+
+def update_translations(new_translations=None):
+    if new_translations is None:
+        new_translations = translations.Translations()
+    translations.STORE.swap(new_translations)
 
 
 class TeamExpander:
 
     def __init__(self):
-        world = GameData()
-        world.populate_world_data()
+        world = self.load_world()
+        self.world = world
         self.troops = world.troops
         self.troop_types = world.troop_types
         self.spells = world.spells
@@ -50,7 +61,9 @@ class TeamExpander:
         self.pets = world.pets
         self.talent_trees = world.talent_trees
         self.spoilers = world.spoilers
+        self.spoiler_index = world.spoiler_index
         self.events = world.events
+        self.event_index = world.event_index
         self.campaign_tasks = world.campaign_tasks
         self.soulforge = world.soulforge
         self.traitstones = world.traitstones
@@ -62,6 +75,101 @@ class TeamExpander:
         self.drop_chances = world.drop_chances
         self.event_kingdoms = world.event_kingdoms
         self.weekly_event = world.weekly_event
+        self.relations = world.relations
+        self.create_indexes()
+
+    def create_indexes(self):
+        self.search_index = SearchIndex()
+        self.register_search_indexes()
+        self.translation_cache = LRUCache(CONFIG.get('translation_cache_size'))
+        self.affix_indexes = {}
+        self.compiled_spells = {}
+        self.kingdom_statistics = KingdomStatistics(self.kingdoms, self.troops)
+        spoiler_dates = [spoiler['date'] for spoiler in self.spoilers]
+        self.spoiler_cache = ScheduledCache(spoiler_dates + [date - SPOILER_HORIZON for date in spoiler_dates],
+                                            clock=datetime.datetime.utcnow)
+        self.event_cache = ScheduledCache(
+            [datetime.datetime.combine(event['start'] + datetime.timedelta(days=1), datetime.time.min)
+             for event in self.events])
+        self.search_index.build_all(translations.LOCALE_MAPPING)
+
+    @staticmethod
+    def load_world():
+        start = time.time()
+        source_files = GameData.SOURCE_FILES + translations.LANG_FILES
+        world = snapshot.load('world', source_files)
+        if world is not None:
+            log.debug(f'Warm start: loaded game data snapshot in {time.time() - start:.3f} seconds.')
+            return world
+        world = GameData()
+        world.populate_world_data()
+        snapshot.save('world', source_files, world, world.get_expiry_date())
+        log.debug(f'Cold start: built game data from source files in {time.time() - start:.3f} seconds.')
+        return world
+
+    def reloaded(self, filenames):
+        """Returns a copy with the given sections reloaded and its own fresh indexes and caches."""
+        expander = copy.copy(self)
+        expander.world = copy.copy(self.world)
+        for filename in filenames:
+            attribute = expander.world.reload_section(filename)
+            setattr(expander, attribute, getattr(expander.world, attribute))
+        expander.create_indexes()
+        return expander
+
+    def forget_pet_translations(self, lang):
+        # pets are shared with the expander that was swapped out, only call this once the new tables are live
+        self.pets.translate_language(lang)
+
+    @staticmethod
+    def save_snapshot(world):
+        source_files = GameData.SOURCE_FILES + translations.LANG_FILES
+        snapshot.save('world', source_files, world, world.get_expiry_date())
+
+    def validate(self):
+        collections = {
+            'troops': len(self.troops) - 1,
+            'weapons': len(self.weapons),
+            'kingdoms': len(self.kingdoms),
+            'classes': len(self.classes),
+            'spells': len(self.spells),
+        }
+        for name, size in collections.items():
+            if size <= 0:
+                raise ValueError(f'Game data contains no {name}.')
+
+    def warm_up(self, languages):
+        for lang in languages:
+            for category in self.search_index.sources:
+                self.search_index.get(category, lang)
+            self.get_affix_index(lang)
+
+    def warm_up_in_background(self):
+        if not CONFIG.get('background_warm_up'):
+            return
+
+        def warm_up_all_languages():
+            start = time.time()
+            languages = translations.LOCALE_MAPPING.keys()
+            self.pets.warm_up(languages)
+            self.warm_up(languages)
+            log.debug(f'Warmed up all languages in {time.time() - start:.3f} seconds.')
+
+        threading.Thread(target=warm_up_all_languages, name='warm_up', daemon=True).start()
+
+    def register_search_indexes(self):
+        self.search_index.register('troop', self.troops,
+                                   lookup_keys=['name', 'kingdom', 'type', 'roles', 'spell.description'],
+                                   translator=self.translate_troop)
+        self.search_index.register('weapon', self.weapons,
+                                   lookup_keys=['name', 'type', 'roles', 'spell.description'],
+                                   translator=self.translate_weapon)
+        self.search_index.register('kingdom', self.kingdoms, lookup_keys=['name'],
+                                   translator=self.translate_kingdom)
+        self.search_index.register('class', self.classes, lookup_keys=['name'],
+                                   translator=self.translate_class)
+        self.search_index.register('traitstone', self.traitstones, lookup_keys=['name'],
+                                   translator=self.translate_traitstone)
 
     @classmethod
     def extract_code_from_message(cls, raw_code):
@@ -131,46 +239,41 @@ class TeamExpander:
             return
         return self.get_team_from_code(code, lang)
 
-    @staticmethod
-    def search_item(search_term, lang, items, lookup_keys, translator, sort_by='name'):
+    def search_item(self, search_term, lang, category, items, translator, sort_by='name'):
         if search_term.isdigit() and int(search_term) in items:
             item = items.get(int(search_term))
             if item:
-                result = item.copy()
-                translator(result, lang)
-                return [result]
+                return [self.get_translated(category, item, translator, lang)]
             return []
-        possible_matches = []
-        for base_item in items.values():
-            if base_item['name'] == '`?`':
-                continue
-            item = base_item.copy()
-            translator(item, lang)
-            lookups = {
-                k: extract_search_tag(dig(item, k)) for k in lookup_keys
-            }
-            real_search = extract_search_tag(search_term)
+        item_ids, is_exact_match = self.search_index.search(category, search_term, lang)
+        possible_matches = [self.get_translated(category, items[item_id], translator, lang) for item_id in item_ids]
+        if is_exact_match:
+            return possible_matches
+        return sorted(possible_matches, key=operator.itemgetter(sort_by))
 
-            if real_search == extract_search_tag(item['name']):
-                return [item]
-            for key, lookup in lookups.items():
-                if real_search in lookup:
-                    possible_matches.append(item)
-                    break
+    @cpu_bound
+    def suggest(self, category, search_term, lang, limit=5):
+        if category == 'pet':
+            return self.pets.suggest(search_term, lang, limit)
+        if category not in self.search_index.sources:
+            return []
+        items, lookup_keys, translator = self.search_index.sources[category]
+        item_ids = self.search_index.suggest(category, search_term, lang, limit)
+        return [self.get_translated(category, items[item_id], translator, lang) for item_id in item_ids]
 
-        return sorted(possible_matches, key=operator.itemgetter(sort_by))
+    def get_translated(self, kind, item, translator, lang):
+        def translate():
+            # only the translated fields are cached, the entity below is read only and shared
+            changes = {}
+            translator(TranslatedView(item, changes), lang)
+            return changes
+
+        return TranslatedView(item, self.translation_cache.get_or_create((kind, item['id'], lang), translate))
 
+    @cpu_bound
     def search_troop(self, search_term, lang):
-        lookup_keys = [
-            'name',
-            'kingdom',
-            'type',
-            'roles',
-            'spell.description',
-        ]
-        return self.search_item(search_term, lang,
+        return self.search_item(search_term, lang, 'troop',
                                 items=self.troops,
-                                lookup_keys=lookup_keys,
                                 translator=self.translate_troop)
 
     def translate_troop(self, troop, lang):
@@ -222,15 +325,19 @@ class TeamExpander:
             new_traits.append(new_trait)
         return new_traits
 
+    @cpu_bound
     def search_kingdom(self, search_term, lang, include_warband=True):
-        lookup_keys = ['name']
-        return self.search_item(search_term, lang, items=self.kingdoms, lookup_keys=lookup_keys,
-                                translator=self.translate_kingdom)
+        kingdoms = self.search_item(search_term, lang, 'kingdom',
+                                    items=self.kingdoms,
+                                    translator=self.translate_kingdom)
+        for kingdom in kingdoms:
+            kingdom['max_power_level'] = self.world.get_max_power_level(kingdom['id'])
+        return kingdoms
 
+    @cpu_bound
     def kingdom_summary(self, lang):
-        kingdoms = [k.copy() for k in self.kingdoms.values() if k['location'] == 'krystara' and len(k['colors']) > 0]
-        for kingdom in kingdoms:
-            self.translate_kingdom(kingdom, lang)
+        kingdoms = [self.get_translated('kingdom', k, self.translate_kingdom, lang) for k in self.kingdoms.values()
+                    if k['location'] == 'krystara' and len(k['colors']) > 0]
         return sorted(kingdoms, key=operator.itemgetter('name'))
 
     def translate_kingdom(self, kingdom, lang):
@@ -241,12 +348,8 @@ class TeamExpander:
         kingdom['punchline'] = _(kingdom['punchline'], lang)
         kingdom['troop_title'] = _('[TROOPS]', lang)
 
-        kingdom['troops'] = []
-        for troop_id in kingdom['troop_ids']:
-            troop = self.troops[troop_id].copy()
-            self.translate_troop(troop, lang)
-            kingdom['troops'].append(troop)
-
+        kingdom['troops'] = [self.get_translated('troop', self.troops[troop_id], self.translate_troop, lang)
+                             for troop_id in kingdom['troop_ids']]
         kingdom['troops'] = sorted(kingdom['troops'], key=operator.itemgetter('name'))
         kingdom['weapons_title'] = _('[WEAPONS:]', lang)
         kingdom['weapons'] = sorted([
@@ -283,22 +386,19 @@ class TeamExpander:
         if 'event_weapon' in kingdom:
             kingdom['event_weapon_title'] = _('[FACTION_WEAPON]', lang)
             kingdom['event_weapon_id'] = kingdom['event_weapon']['id']
-            event_weapon = kingdom['event_weapon'].copy()
-            self.translate_weapon(event_weapon, lang)
-            kingdom['event_weapon'] = event_weapon
+            kingdom['event_weapon'] = self.get_translated('weapon', kingdom['event_weapon'], self.translate_weapon,
+                                                          lang)
         kingdom['max_power_level_title'] = _('[KINGDOM_POWER_LEVELS]', lang)
 
+    @cpu_bound
     def search_class(self, search_term, lang):
-        lookup_keys = ['name']
-        return self.search_item(search_term, lang,
+        return self.search_item(search_term, lang, 'class',
                                 items=self.classes,
-                                translator=self.translate_class,
-                                lookup_keys=lookup_keys)
+                                translator=self.translate_class)
 
+    @cpu_bound
     def class_summary(self, lang):
-        classes = [c.copy() for c in self.classes.values()]
-        for c in classes:
-            self.translate_class(c, lang)
+        classes = [self.get_translated('class', c, self.translate_class, lang) for c in self.classes.values()]
         return sorted(classes, key=operator.itemgetter('name'))
 
     def translate_class(self, _class, lang):
@@ -328,6 +428,7 @@ class TeamExpander:
         _class['weapon_bonus'] = _('[MAGIC_BONUS]', lang) + " " + _(
             f'[MAGIC_BONUS_{COLORS.index(_class["weapon_color"])}]', lang)
 
+    @cpu_bound
     def search_talent(self, search_term, lang):
         possible_matches = []
         for tree in self.talent_trees.values():
@@ -371,22 +472,14 @@ class TeamExpander:
         ]
 
     def get_troops_with_trait(self, trait, lang):
-        return self.get_objects_by_trait(trait, self.troops, self.translate_troop, lang)
+        return [self.get_translated('troop', self.troops[troop_id], self.translate_troop, lang)
+                for troop_id in self.relations['trait_troops'].get(trait['code'], [])]
 
     def get_classes_with_trait(self, trait, lang):
-        return self.get_objects_by_trait(trait, self.classes, self.translate_class, lang)
-
-    @staticmethod
-    def get_objects_by_trait(trait, objects, translator, lang):
-        result = []
-        for o in objects.values():
-            trait_codes = [t['code'] for t in o['traits']] if 'traits' in o else []
-            if trait['code'] in trait_codes:
-                translated_object = o.copy()
-                translator(translated_object, lang)
-                result.append(translated_object)
-        return result
+        return [self.get_translated('class', self.classes[class_id], self.translate_class, lang)
+                for class_id in self.relations['trait_classes'].get(trait['code'], [])]
 
+    @cpu_bound
     def search_trait(self, search_term, lang):
         possible_matches = []
         for code, trait in self.traits.items():
@@ -411,19 +504,14 @@ class TeamExpander:
                     possible_matches.append(result)
         return sorted(self.enrich_traits(possible_matches, lang), key=operator.itemgetter('name'))
 
+    @cpu_bound
     def search_pet(self, search_term, lang):
         return self.pets.search(search_term, lang)
 
+    @cpu_bound
     def search_weapon(self, search_term, lang):
-        lookup_keys = [
-            'name',
-            'type',
-            'roles',
-            'spell.description',
-        ]
-        return self.search_item(search_term, lang,
+        return self.search_item(search_term, lang, 'weapon',
                                 items=self.weapons,
-                                lookup_keys=lookup_keys,
                                 translator=self.translate_weapon)
 
     def translate_weapon(self, weapon, lang):
@@ -481,54 +569,68 @@ class TeamExpander:
             weapon['requirement_text'] += ' (' + _(f'[{weapon["event_faction"]}_NAME]', lang) + ' ' + _(
                 '[FACTION_WEAPON]', lang) + ')'
 
+    def get_affix_index(self, lang):
+        if lang in self.affix_indexes:
+            return self.affix_indexes[lang]
+        affix_index = {}
+        for weapon_position, weapon in enumerate(self.weapons.values()):
+            for affix_position, spell in enumerate(weapon['affixes']):
+                if spell['id'] not in affix_index:
+                    affix = self.translate_spell(spell['id'], lang)
+                    affix_index[spell['id']] = {
+                        'name_tag': extract_search_tag(affix['name']),
+                        'description_tag': extract_search_tag(affix['description']),
+                        'affix': affix,
+                        'weapons': [],
+                    }
+                affix_index[spell['id']]['weapons'].append((weapon_position, affix_position, weapon['id']))
+        self.affix_indexes[lang] = affix_index
+        return affix_index
+
+    @cpu_bound
     def search_affix(self, search_term, lang):
         real_search = extract_search_tag(search_term)
-        results = {}
-        for weapon in self.weapons.values():
-            my_weapon = weapon.copy()
-            self.translate_weapon(my_weapon, lang)
-            affixes = [affix for affix in my_weapon['upgrades'] if 'cost' in affix]
-            for affix in affixes:
-                search_name = extract_search_tag(affix['name'])
-                search_desc = extract_search_tag(affix['description'])
-                if real_search == search_name \
-                        or real_search == search_desc \
-                        or real_search in search_name \
-                        or real_search in search_desc:
-                    if affix['name'] in results:
-                        results[affix['name']]['weapons'].append(my_weapon)
-                        results[affix['name']]['num_weapons'] += 1
-                    else:
-                        results[affix['name']] = affix.copy()
-                        results[affix['name']]['weapons_title'] = _('[SOULFORGE_TAB_WEAPONS]', lang)
-                        results[affix['name']]['weapons'] = [my_weapon]
-                        results[affix['name']]['num_weapons'] = 1
-        for name, affix in results.items():
+        matches = defaultdict(list)
+        for entry in self.get_affix_index(lang).values():
+            if real_search in entry['name_tag'] or real_search in entry['description_tag']:
+                matches[entry['affix']['name']].append(entry)
+        for name, entries in matches.items():
             if real_search == extract_search_tag(name):
-                return [affix]
-        return sorted(results.values(), key=operator.itemgetter('name'))
+                matches = {name: entries}
+                break
+        weapons = {}
+        results = [self.translate_affix_match(entries, weapons, lang) for entries in matches.values()]
+        if len(results) == 1:
+            return results
+        return sorted(results, key=operator.itemgetter('name'))
+
+    def translate_affix_match(self, entries, weapons, lang):
+        result = entries[0]['affix'].copy()
+        result['weapons_title'] = _('[SOULFORGE_TAB_WEAPONS]', lang)
+        result['weapons'] = []
+        for weapon_position, affix_position, weapon_id in sorted(w for entry in entries for w in entry['weapons']):
+            if weapon_id not in weapons:
+                weapons[weapon_id] = self.get_translated('weapon', self.weapons[weapon_id], self.translate_weapon, lang)
+            result['weapons'].append(weapons[weapon_id])
+        result['num_weapons'] = len(result['weapons'])
+        return result
 
+    @cpu_bound
     def search_traitstone(self, search_term, lang):
-        return self.search_item(search_term, lang,
+        return self.search_item(search_term, lang, 'traitstone',
                                 items=self.traitstones,
-                                lookup_keys=['name'],
                                 translator=self.translate_traitstone)
 
     def translate_traitstone(self, traitstone, lang):
-        troops = []
-        for troop_id in traitstone['troop_ids']:
-            amount = sum([t['amount'] for t in self.troops[troop_id]['traitstones'] if t['id'] == traitstone['id']])
-            troops.append([_(self.troops[troop_id]['name'], lang), amount])
+        troops = [[_(self.troops[troop_id]['name'], lang), amount]
+                  for troop_id, amount in self.relations['traitstone_troops'][traitstone['name']]]
         traitstone['troops'] = sorted(troops, key=operator.itemgetter(1), reverse=True)
 
-        classes = []
-        for class_id in traitstone['class_ids']:
-            amount = sum([t['amount'] for t in self.classes[class_id]['traitstones'] if t['id'] == traitstone['id']])
-            classes.append([_(self.classes[class_id]['name'], lang), amount])
-        traitstone['classes'] = classes
+        traitstone['classes'] = [[_(self.classes[class_id]['name'], lang), amount]
+                                 for class_id, amount in self.relations['traitstone_classes'][traitstone['name']]]
 
         kingdoms = []
-        for kingdom_id in traitstone['kingdom_ids']:
+        for kingdom_id in sorted(traitstone['kingdom_ids'], key=int):
             kingdoms.append(_(self.kingdoms[int(kingdom_id)]['name'], lang))
         if not traitstone['kingdom_ids']:
             kingdoms.append(_('[ALL_KINGDOMS]', lang))
@@ -540,6 +642,12 @@ class TeamExpander:
         traitstone['kingdoms_title'] = _('[KINGDOMS]', lang)
 
     def translate_spell(self, spell_id, lang):
+        key = (spell_id, lang)
+        if key not in self.compiled_spells:
+            self.compiled_spells[key] = self.compile_spell(spell_id, lang)
+        return self.compiled_spells[key].copy()
+
+    def compile_spell(self, spell_id, lang):
         spell = self.spells[spell_id]
         magic = _('[MAGIC]', lang)
 
@@ -558,7 +666,7 @@ class TeamExpander:
                 number = int(round(1 / multiplier))
                 divisor = f' / {number}'
             damage = f'[{multiplier_text}{magic}{divisor}{spell_amount}]'
-            number_of_replacements = len(re.findall(r'\{\d\}', description))
+            number_of_replacements = len(SPELL_PLACEHOLDER.findall(description))
             has_half_replacement = len(spell['effects']) == number_of_replacements - 1
             if '{2}' in description and has_half_replacement:
                 multiplier *= 0.5
@@ -614,12 +722,14 @@ class TeamExpander:
         return sorted(result.values(), key=operator.itemgetter('start'))
 
     def guess_weekly_kingdom_from_troop_spoilers(self, lang):
+        return self.spoiler_cache.get_or_create(('weekly_kingdoms', lang),
+                                                lambda now: self.find_weekly_kingdoms(now, lang))
+
+    def find_weekly_kingdoms(self, now, lang):
         result = {}
-        latest_date = datetime.datetime.utcnow()
-        for spoiler in self.spoilers:
-            if spoiler['type'] == 'troop' \
-                    and spoiler['date'].weekday() == 0 \
-                    and spoiler['date'] > latest_date:
+        latest_date = now
+        for spoiler in self.spoiler_index.between(now, type_='troop'):
+            if spoiler['date'].weekday() == 0 and spoiler['date'] > latest_date:
                 troop = self.troops[spoiler['id']]
                 if troop['rarity'] == 'Mythic':
                     continue
@@ -633,8 +743,11 @@ class TeamExpander:
         return result
 
     def get_events(self, lang):
-        today = datetime.date.today()
-        events = [self.translate_event(e, lang) for e in self.events if today <= e['start']]
+        return self.event_cache.get_or_create(('events', lang), lambda now: self.find_events(now, lang))
+
+    def find_events(self, now, lang):
+        today = now.date()
+        events = [self.translate_event(e, lang) for e in self.event_index.between(today)]
         return events
 
     def translate_event(self, event, lang):
@@ -716,10 +829,13 @@ class TeamExpander:
 
         return new_task
 
-    def get_spoilers(self, lang):
+    def get_spoilers(self, lang, spoiler_type=None):
+        return self.spoiler_cache.get_or_create(('spoilers', spoiler_type, lang),
+                                                lambda now: self.find_spoilers(now, lang, spoiler_type))
+
+    def find_spoilers(self, now, lang, spoiler_type=None):
         spoilers = []
-        now = datetime.datetime.utcnow()
-        near_term_spoilers = [s for s in self.spoilers if now <= s['date'] <= now + datetime.timedelta(days=180)]
+        near_term_spoilers = self.spoiler_index.between(now, now + SPOILER_HORIZON, spoiler_type)
         for spoiler in near_term_spoilers:
             translated = self.translate_spoiler(spoiler, lang)
             if translated:
@@ -814,30 +930,19 @@ class TeamExpander:
         return toplist
 
     def kingdom_percentage(self, filter_name, filter_values, lang):
-        result = {}
-        now = datetime.datetime.utcnow()
-        hidden_kingdoms = [3032, 3033, 3034, 3038]
+        key = ('kingdom_percentage', filter_name, tuple(filter_values), lang)
+        return self.spoiler_cache.get_or_create(
+            key, lambda now: self.find_kingdom_percentage(filter_name, filter_values, now, lang))
 
-        for filter_ in filter_values:
-            kingdoms = []
-            for kingdom in self.kingdoms.values():
-                if kingdom['location'] != 'krystara':
-                    continue
-                if kingdom['id'] in hidden_kingdoms:
-                    continue
-                all_troops = [self.troops.get(t) for t in kingdom['troop_ids']]
-                available_troops = [t for t in all_troops if t.get('release_date', now) <= now]
-                if not available_troops:
-                    continue
-                fitting_troops = [t for t in available_troops if filter_ in t[filter_name]]
-                kingdoms.append({
-                    'name': _(kingdom['name'], lang),
-                    'total': len(available_troops),
-                    'fitting_troops': len(fitting_troops),
-                    'percentage': len(fitting_troops) / len(available_troops),
-                })
-            top_kingdom = sorted(kingdoms, key=operator.itemgetter('percentage'), reverse=True)[0]
-            result[filter_] = top_kingdom
+    def find_kingdom_percentage(self, filter_name, filter_values, now, lang):
+        result = {}
+        for filter_, top_kingdom in self.kingdom_statistics.top_kingdoms(filter_name, filter_values, now).items():
+            result[filter_] = {
+                'name': _(self.kingdoms[top_kingdom['kingdom_id']]['name'], lang),
+                'total': top_kingdom['total'],
+                'fitting_troops': top_kingdom['fitting_troops'],
+                'percentage': top_kingdom['percentage'],
+            }
         return result
 
     def get_color_kingdoms(self, lang):
@@ -888,6 +993,7 @@ class TeamExpander:
                 result.append(str(troops[0]['id']))
         return result
 
+    @cpu_bound
     def get_soulforge_weapon_image_data(self, search_term, date, switch, lang):
         search_result = self.search_weapon(search_term, lang)
         if len(search_result) != 1:
@@ -903,10 +1009,8 @@ class TeamExpander:
                 'filename': filename,
                 'amount': requirements['jewels'],
                 'available_on': translate_day(color_code, lang),
-                'kingdoms': sorted([_(kingdom['name'], lang) for kingdom in self.kingdoms.values()
-                                    if 'primary_color' in kingdom
-                                    and color == kingdom['primary_color']
-                                    and kingdom['location'] == 'krystara']),
+                'kingdoms': sorted([_(self.kingdoms[kingdom_id]['name'], lang)
+                                    for kingdom_id in self.relations['color_kingdoms'][color]]),
             })
         requirements['jewels'] = jewels
         kingdom = self.kingdoms[weapon['kingdom_id']]
@@ -971,6 +1075,7 @@ class TeamExpander:
             if isinstance(data[new_key], dict):
                 self.translate_drop_chances(data[new_key], lang)
 
+    @cpu_bound
     def get_drop_chances(self, lang):
         drop_chances = self.drop_chances.copy()
         self.translate_drop_chances(drop_chances, lang)
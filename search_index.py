@@ -0,0 +1,144 @@
+import bisect
+import datetime
+import operator
+from array import array
+from collections import Counter, defaultdict
+
+from util import dig, extract_search_tag, levenshtein
+
+
+class FuzzyIndex:
+    MAX_CANDIDATES = 20
+
+    def __init__(self, names):
+        self.names = names
+        self.trigrams = defaultdict(list)
+        for tag in names:
+            for trigram in self.get_trigrams(tag):
+                self.trigrams[trigram].append(tag)
+
+    @staticmethod
+    def get_trigrams(tag):
+        padded = f'  {tag} '
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def suggest(self, search_term, limit=5):
+        real_search = extract_search_tag(search_term)
+        if not real_search:
+            return []
+        max_distance = min(3, max(1, len(real_search) // 3))
+        search_trigrams = self.get_trigrams(real_search)
+        min_overlap = len(search_trigrams) - 3 * max_distance
+        overlaps = Counter()
+        for trigram in search_trigrams:
+            overlaps.update(self.trigrams.get(trigram, ()))
+        ranked = []
+        for tag, overlap in overlaps.most_common(self.MAX_CANDIDATES):
+            if overlap < min_overlap:
+                break
+            distance = levenshtein(real_search, tag, max_distance)
+            if distance <= max_distance:
+                ranked.append((distance, -overlap, tag))
+        ranked.sort()
+        return [self.names[tag] for distance, overlap, tag in ranked[:limit]]
+
+
+class DateRangeIndex:
+    def __init__(self, entries, start_key, end_key=None):
+        self.start_key = start_key
+        self.end_key = end_key
+        self.entries = {None: sorted(entries, key=operator.itemgetter(start_key))}
+        for entry in self.entries[None]:
+            self.entries.setdefault(entry['type'], []).append(entry)
+        self.starts = {type_: [entry[start_key] for entry in entries] for type_, entries in self.entries.items()}
+        self.max_duration = datetime.timedelta(0)
+        if end_key:
+            self.max_duration = max([entry[end_key] - entry[start_key] for entry in self.entries[None]],
+                                    default=datetime.timedelta(0))
+
+    def between(self, start, end=None, type_=None):
+        starts = self.starts.get(type_, [])
+        low = bisect.bisect_left(starts, start)
+        high = len(starts) if end is None else bisect.bisect_right(starts, end)
+        return self.entries.get(type_, [])[low:high]
+
+    def active_on(self, date, type_=None):
+        candidates = self.between(date - self.max_duration, date, type_)
+        return [entry for entry in candidates if entry[self.end_key] >= date]
+
+
+class SearchIndex:
+    # substrings up to this length are looked up directly, longer ones through their rarest piece
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self.sources = {}
+        self.indexes = {}
+
+    def register(self, category, items, lookup_keys, translator):
+        self.sources[category] = (items, lookup_keys, translator)
+
+    @classmethod
+    def get_grams(cls, tags):
+        return {tag[i:i + size] for tag in tags for size in range(1, cls.GRAM_SIZE + 1)
+                for i in range(len(tag) - size + 1)}
+
+    def build(self, category, lang):
+        items, lookup_keys, translator = self.sources[category]
+        exact_matches = {}
+        item_ids = []
+        search_tags = []
+        grams = defaultdict(list)
+        for item_id, base_item in items.items():
+            if base_item['name'] == '`?`':
+                continue
+            item = base_item.copy()
+            translator(item, lang)
+            exact_matches.setdefault(extract_search_tag(item['name']), item_id)
+            tags = tuple(extract_search_tag(dig(item, key)) for key in lookup_keys)
+            for gram in self.get_grams(tags):
+                grams[gram].append(len(item_ids))
+            item_ids.append(item_id)
+            search_tags.append(tags)
+        index = {
+            'exact_matches': exact_matches,
+            'item_ids': item_ids,
+            'search_tags': search_tags,
+            'grams': {gram: array('I', positions) for gram, positions in grams.items()},
+            'fuzzy': FuzzyIndex(exact_matches),
+        }
+        self.indexes[(category, lang)] = index
+        return index
+
+    def build_all(self, languages):
+        for lang in languages:
+            for category in self.sources:
+                self.build(category, lang)
+
+    def get(self, category, lang):
+        index = self.indexes.get((category, lang))
+        if index is None:
+            # only languages outside of build_all end up here
+            index = self.build(category, lang)
+        return index
+
+    def search(self, category, search_term, lang):
+        index = self.get(category, lang)
+        real_search = extract_search_tag(search_term)
+        exact_match = index['exact_matches'].get(real_search)
+        if exact_match is not None:
+            return [exact_match], True
+        if not real_search:
+            return list(index['item_ids']), False
+        if len(real_search) <= self.GRAM_SIZE:
+            return [index['item_ids'][position] for position in index['grams'].get(real_search, ())], False
+        pieces = [real_search[i:i + self.GRAM_SIZE] for i in range(len(real_search) - self.GRAM_SIZE + 1)]
+        candidates = min((index['grams'].get(piece, ()) for piece in pieces), key=len)
+        item_ids = [
+            index['item_ids'][position] for position in candidates
+            if any(real_search in tag for tag in index['search_tags'][position])
+        ]
+        return item_ids, False
+
+    def suggest(self, category, search_term, lang, limit=5):
+        return self.get(category, lang)['fuzzy'].suggest(search_term, limit)
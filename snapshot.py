@@ -0,0 +1,76 @@
+import datetime
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+
+from base_bot import log
+from configurations import CONFIG
+from game_assets import GameAssets
+
+CODE_FILES = ['snapshot.py', 'translations.py', 'game_constants.py', 'search_index.py', 'util.py', 'game_assets.py',
+              'data_source/*.py']
+
+
+def get_code_files():
+    base_folder = os.path.dirname(os.path.abspath(__file__))
+    for pattern in CODE_FILES:
+        yield from sorted(glob.glob(os.path.join(base_folder, pattern)))
+
+
+def get_snapshot_key(filenames):
+    checksum = hashlib.sha256()
+    for path in get_code_files():
+        with open(path, 'rb') as f:
+            checksum.update(f.read())
+    for filename in filenames:
+        checksum.update(filename.encode())
+        if not GameAssets.exists(filename):
+            continue
+        with open(GameAssets.path(filename), 'rb') as f:
+            checksum.update(f.read())
+    return checksum.hexdigest()
+
+
+def get_snapshot_path(name):
+    return os.path.join(CONFIG.get('snapshot_folder'), f'{name}.pickle')
+
+
+def load(name, filenames):
+    path = get_snapshot_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            # the small header comes first, a stale snapshot is rejected without unpickling its data
+            header = pickle.load(f)
+            if header['key'] != get_snapshot_key(filenames):
+                return None
+            if header['valid_until'] and header['valid_until'] <= datetime.datetime.now():
+                return None
+            return pickle.load(f)
+    except Exception as e:
+        log.warning(f'Could not read snapshot {path}: {e}')
+        return None
+
+
+def save(name, filenames, data, valid_until=None):
+    path = get_snapshot_path(name)
+    header = {
+        'key': get_snapshot_key(filenames),
+        'valid_until': valid_until,
+    }
+    temp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # worker processes and the bot can save the same snapshot at the same time
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+            temp_path = f.name
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except Exception as e:
+        log.warning(f'Could not write snapshot {path}: {e}')
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
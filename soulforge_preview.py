@@ -1,15 +1,23 @@
+import asyncio
+import hashlib
 import io
+import json
 import math
-import os
 from textwrap import wrap
 from typing import Mapping
 
-import requests
 from wand.color import Color
 from wand.drawing import Drawing
-from wand.image import Image
 
-BASE_URL = 'https://garyatrics.com/gow_assets'
+from caches import DiskLRUCache
+from configurations import CONFIG
+from image_assets import get_image, prefetch, scale_down
+from render_pool import RENDER_POOL
+
+# bump whenever the rendered image changes for the same input, so cached previews are not reused.
+RENDERER_VERSION = 1
+PREVIEW_CACHE = DiskLRUCache(CONFIG.get('soulforge_preview_cache_folder'),
+                             CONFIG.get('soulforge_preview_cache_megabytes') * 1024 * 1024, '.png')
 
 FONTS = {
     'opensans': r'fonts/OpenSans-Regular.ttf',
@@ -17,35 +25,6 @@ FONTS = {
 }
 
 
-def download_image(path):
-    cache_path = '.cache'
-    cache_filename = os.path.join(cache_path, path)
-    if os.path.exists(cache_filename):
-        f = open(cache_filename, 'rb')
-    else:
-        url = f'{BASE_URL}/{path}'
-        r = requests.get(url)
-        f = io.BytesIO(r.content)
-        cache_subdir = os.path.dirname(cache_filename)
-        if not os.path.exists(cache_subdir):
-            os.makedirs(cache_subdir)
-        with open(cache_filename, 'wb') as cache:
-            cache.write(f.read())
-        f.seek(0)
-    img = Image(file=f)
-    img.alpha_channel = True
-    f.close()
-    return img
-
-
-def scale_down(width, height, max_size):
-    ratio = width / height
-    if width > height:
-        return max_size, round(max_size / ratio)
-    else:
-        return round(ratio * max_size), max_size
-
-
 def word_wrap(image, draw, text, roi_width, roi_height):
     """Break long text to multiple lines, and reduce point size
     until all text fits within a bounding box."""
@@ -89,14 +68,10 @@ class WeeklyPreview:
         self.spacing = 0
 
     def render_background(self):
-        self.img = download_image(self.data['background'])
+        self.img = get_image(self.data['background'])
         self.spacing = self.img.width // 2 - 980
-        gow_logo = download_image(self.data['gow_logo'])
-        ratio = gow_logo.width / gow_logo.height
-        gow_logo.resize(round(200 * ratio), 200)
-        switch_logo = Image(filename='switch_logo.png')
-        ratio = switch_logo.width / switch_logo.height
-        switch_logo.resize(round(100 * ratio), 100)
+        gow_logo = get_image(self.data['gow_logo'], height=200)
+        switch_logo = get_image('switch_logo.png', height=100, local=True)
         with Drawing() as draw:
             color = Color('rgba(0, 0, 0, 0.7)')
             draw.fill_color = color
@@ -116,9 +91,8 @@ class WeeklyPreview:
             draw.font = FONTS['raleway']
             draw.text(450, 200, f'{self.data["texts"]["soulforge"]}: {self.data["date"]}')
 
-            kingdom_logo = download_image(self.data['kingdom_logo'])
-            kingdom_width, kingdom_height = scale_down(kingdom_logo.width, kingdom_logo.height, 220)
-            kingdom_logo.resize(kingdom_width, kingdom_height)
+            kingdom_logo = get_image(self.data['kingdom_logo'], max_size=220)
+            kingdom_width, kingdom_height = kingdom_logo.size
             draw.composite(operator='atop',
                            left=self.img.width - kingdom_width - 15, top=15,
                            width=kingdom_width, height=kingdom_height,
@@ -152,9 +126,7 @@ class WeeklyPreview:
     def render_soulforge_screen(self):
         left, top, width, height = self.get_box_coordinates(1)
 
-        self.weapon = download_image(self.data['filename'])
-        ratio = self.weapon.width / self.weapon.height
-        self.weapon.resize(round(180 * ratio), 180)
+        self.weapon = get_image(self.data['filename'], height=180)
         with Drawing() as draw:
             draw.fill_color = Color('none')
             draw.stroke_color = Color('rgb(16, 17, 19)')
@@ -198,7 +170,7 @@ class WeeklyPreview:
                 draw.circle(center, perimeter)
                 if requirement_objects[i]:
                     filename, amount = requirement_objects[i]
-                    requirement_img = download_image(filename)
+                    requirement_img = get_image(filename)
                     max_size = 70
                     r_width, r_height = scale_down(*requirement_img.size, max_size)
                     draw.composite(operator='atop',
@@ -248,9 +220,9 @@ class WeeklyPreview:
             draw(self.img)
 
     def render_affixes(self):
-        affix_icon = download_image(self.data['affix_icon'])
-        gold_medal = download_image(self.data['gold_medal'])
-        mana = download_image(self.data['mana_color'])
+        affix_icon = get_image(self.data['affix_icon'])
+        gold_medal = get_image(self.data['gold_medal'])
+        mana = get_image(self.data['mana_color'])
         with Drawing() as draw:
             draw.fill_color = Color('rgba(0, 0, 0, 0.7)')
             draw.stroke_width = 0
@@ -321,9 +293,7 @@ class WeeklyPreview:
             icon_top = round(height - 70)
             for i, (stat, increase) in enumerate(self.data['stat_increases'].items()):
                 icon_left = left + margin + i * (box_width + distance)
-                stat_icon = download_image(self.data['stat_icon'].format(stat=stat))
-                width, height = scale_down(*stat_icon.size, max_size=50)
-                stat_icon.resize(width=width, height=height)
+                stat_icon = get_image(self.data['stat_icon'].format(stat=stat), max_size=50)
                 draw.text(icon_left + 70, top + icon_top + int(1.1 * draw.font_size), str(increase))
                 draw.composite(operator='atop',
                                left=icon_left, top=top + icon_top,
@@ -356,9 +326,8 @@ class WeeklyPreview:
             draw.font_size = 30
             draw.font = FONTS['raleway']
             for jewel in self.data['requirements']['jewels']:
-                jewel_icon = download_image(jewel['filename'])
-                jewel_width, jewel_height = scale_down(jewel_icon.width, jewel_icon.height, 50)
-                jewel_icon.resize(width=jewel_width, height=jewel_height)
+                jewel_icon = get_image(jewel['filename'], max_size=50)
+                jewel_width, jewel_height = jewel_icon.size
                 draw.composite(operator='atop',
                                left=left + 25, top=top + offset + round(1.5 * draw.font_size),
                                width=jewel_width, height=jewel_height,
@@ -381,7 +350,7 @@ class WeeklyPreview:
 
     def draw_watermark(self):
         with Drawing() as draw:
-            avatar = Image(filename='hawx_transparent.png')
+            avatar = get_image('hawx_transparent.png', local=True)
             max_size = 100
             width, height = scale_down(*avatar.size, max_size)
             draw.composite(operator='atop',
@@ -407,6 +376,14 @@ class WeeklyPreview:
         self.img.format = 'png'
         self.img.save(filename='test.png')
 
+    def get_asset_paths(self):
+        keys = ('background', 'gow_logo', 'kingdom_logo', 'filename', 'affix_icon', 'gold_medal', 'mana_color')
+        paths = {self.data[key] for key in keys}
+        paths.update(requirement[0] for requirement in self.extract_requirements() if requirement)
+        paths.update(self.data['stat_icon'].format(stat=stat) for stat in self.data['stat_increases'])
+        paths.update(jewel['filename'] for jewel in self.data['requirements']['jewels'])
+        return paths
+
     def extract_requirements(self) -> Mapping[str, str]:
         result = [None for _ in range(6)]
         souls = 'Commonrewards_icon_soul_small_full.png'
@@ -426,7 +403,7 @@ class WeeklyPreview:
         return result
 
 
-def render_all(result):
+def render_png(result):
     overview = WeeklyPreview(result)
     overview.render_background()
     overview.render_soulforge_screen()
@@ -434,4 +411,38 @@ def render_all(result):
     overview.render_farming()
     overview.draw_watermark()
 
-    return io.BytesIO(overview.img.make_blob('png'))
+    return overview.img.make_blob('png')
+
+
+def render_all(result):
+    return io.BytesIO(render_png(result))
+
+
+def with_str_keys(data):
+    # sort_keys cannot order dicts mixing int and str keys
+    if isinstance(data, Mapping):
+        return {str(key): with_str_keys(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [with_str_keys(value) for value in data]
+    return data
+
+
+def get_cache_key(result):
+    data = json.dumps(with_str_keys(result), sort_keys=True, default=str)
+    return hashlib.sha256(f'{RENDERER_VERSION}:{data}'.encode()).hexdigest()
+
+
+def is_cached(result):
+    return get_cache_key(result) in PREVIEW_CACHE
+
+
+async def render_cached(result):
+    # the preview cache reads and writes files, keep that off the event loop
+    loop = asyncio.get_event_loop()
+    key = get_cache_key(result)
+    png = await loop.run_in_executor(None, PREVIEW_CACHE.get, key)
+    if png is None:
+        await prefetch(WeeklyPreview(result).get_asset_paths())
+        png = await RENDER_POOL.render(render_png, result)
+        await loop.run_in_executor(None, PREVIEW_CACHE.set, key, png)
+    return png
@@ -1,5 +1,11 @@
+import contextlib
+import copy
+import sys
+import threading
+
 import humanize
 
+import snapshot
 from game_assets import GameAssets
 
 LANGUAGES = {
@@ -29,17 +35,43 @@ LOCALE_MAPPING = {
     'zh': 'zh_CN',
 }
 
-LANG_FILES = [f'GemsOfWar_{language}.json' for language in LANGUAGES.values()]
+LANG_FILES = list(dict.fromkeys(f'GemsOfWar_{language}.json' for language in LANGUAGES.values()))
+
+
+def load_table(filename):
+    return {sys.intern(key): sys.intern(value) if isinstance(value, str) else value
+            for key, value in GameAssets.load(filename).items()}
 
 
 class Translations:
     BASE_LANG = 'en'
 
     def __init__(self):
-        self._translations = {}
-        for lang_code, language in LANGUAGES.items():
-            self._translations[lang_code] = GameAssets.load(
-                f'GemsOfWar_{language}.json')
+        self.version = 0
+        self._translations = snapshot.load('translations', LANG_FILES)
+        if self._translations is not None:
+            return
+        tables = {filename: load_table(filename) for filename in LANG_FILES}
+        self._translations = {
+            lang_code: tables[f'GemsOfWar_{language}.json'] for lang_code, language in LANGUAGES.items()
+        }
+        self.save_snapshot()
+
+    @staticmethod
+    def get_language_codes(filename):
+        return [lang_code for lang_code, language in LANGUAGES.items()
+                if f'GemsOfWar_{language}.json' == filename]
+
+    def reload_language(self, filename):
+        new_translations = copy.copy(self)
+        new_translations._translations = self._translations.copy()
+        table = load_table(filename)
+        for lang_code in self.get_language_codes(filename):
+            new_translations._translations[lang_code] = table
+        return new_translations
+
+    def save_snapshot(self):
+        snapshot.save('translations', LANG_FILES, self._translations)
 
     def get(self, key, lang=''):
         if lang not in self._translations:
@@ -48,6 +80,62 @@ class Translations:
         return self._translations[lang].get(key, key)
 
 
+class PinnedTranslations(threading.local):
+    """The tables a thread translates with, taken from the store on first use and pinned again per request."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        if name != 'translations':
+            raise AttributeError(name)
+        self.translations = self.store.get_translations()
+        return self.translations
+
+
+class TranslationStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = PinnedTranslations(self)
+        self.current = None
+        self.version = 0
+
+    def get_translations(self):
+        if self.current is None:
+            with self.lock:
+                if self.current is None:
+                    self.activate(Translations())
+        return self.current
+
+    def activate(self, translations):
+        self.version += 1
+        translations.version = self.version
+        self.current = translations
+
+    def swap(self, translations):
+        with self.lock:
+            self.activate(translations)
+        # the swapping thread, usually the event loop, moves over right away
+        self.local.translations = translations
+
+    @contextlib.contextmanager
+    def pinned(self, translations=None):
+        """Translates with the given or the current tables until the block ends, even if the store swaps them."""
+        self.local.translations = self.get_translations() if translations is None else translations
+        try:
+            yield self.local.translations
+        finally:
+            # the next use in this thread picks up whatever is current by then
+            del self.local.translations
+
+
+STORE = TranslationStore()
+
+
+def translate(key, lang=''):
+    return STORE.local.translations.get(key, lang)
+
+
 class HumanizeTranslator:
     def __init__(self, lang):
         self.lang = lang
@@ -1,6 +1,34 @@
+import asyncio
+import datetime
+import json
+import operator
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 
+import snapshot
+from caches import DiskLRUCache, LRUCache, ScheduledCache
+from command_registry import COMMAND_DISPATCHER, COMMAND_REGISTRY
+from configurations import CONFIG
 from data_source import PetContainer, Pets
+from data_source.entity import TranslatedView
+from data_source.game_data import GameData
+from data_source.kingdom import Kingdom
+from data_source.troop import Troop
+from jobs.news_delivery import NewsDelivery, TokenBucket
+from kingdom_statistics import KingdomStatistics
+from models.db import DB, DBWriter, staged
+from models.news_queue import NewsQueue
+from render_pool import RenderPool, RenderQueueFull, RenderWorkerError
+from search_index import DateRangeIndex, FuzzyIndex, SearchIndex
+from translations import LANG_FILES, TranslationStore, translate
+from util import levenshtein
+from worker_pool import WorkerPool, cpu_bound
 
 
 class PetTests(unittest.TestCase):
@@ -31,6 +59,492 @@ class PetTests(unittest.TestCase):
         self.assertEqual(len(search_result), 1)
         self.assertDictEqual(search_result[0].data, self.pets[13000]['en'].data)
 
+    def test_lazy_translations(self):
+        pet = self.pets[13111]
+        self.assertNotIn('de', pet.translations)
+        pet.fill_untranslated_kingdom_name(3067, 'Zuul\'Goth')
+        self.assertEqual(pet['de'].effect_data, 'Zuul\'Goth')
+        self.assertIn('de', pet.translations)
+        with self.assertRaises(KeyError):
+            pet.translations['xx']
+
+
+class SearchIndexTests(unittest.TestCase):
+    def setUp(self):
+        def translator(item, lang):
+            item['name'] = f'{item["name"]} {lang}'
+
+        items = {
+            1: {'name': 'Goblin King', 'kingdom': 'Zaejin'},
+            2: {'name': 'Goblin', 'kingdom': 'Zaejin'},
+            3: {'name': 'Bone Dragon', 'kingdom': 'Ghulvania'},
+        }
+        self.index = SearchIndex()
+        self.index.register('troop', items, lookup_keys=['name', 'kingdom'], translator=translator)
+
+    def test_exact_match(self):
+        self.assertEqual(self.index.search('troop', 'goblin en', 'en'), ([2], True))
+
+    def test_partial_match(self):
+        self.assertEqual(self.index.search('troop', 'zaejin', 'en'), ([1, 2], False))
+        self.assertEqual(self.index.search('troop', 'dragon', 'de'), ([3], False))
+
+    def test_short_and_long_substrings(self):
+        self.assertEqual(self.index.search('troop', 'n', 'en'), ([1, 2, 3], False))
+        self.assertEqual(self.index.search('troop', 'lin', 'en'), ([1, 2], False))
+        self.assertEqual(self.index.search('troop', 'nedragon', 'en'), ([3], False))
+        self.assertEqual(self.index.search('troop', 'dragonen', 'de'), ([], False))
+
+    def test_index_per_language(self):
+        self.index.build_all(['en'])
+        self.assertIn(('troop', 'en'), self.index.indexes)
+        self.assertNotIn(('troop', 'de'), self.index.indexes)
+        self.index.search('troop', 'goblin', 'de')
+        self.assertIn(('troop', 'de'), self.index.indexes)
+
+
+class FuzzySearchTests(unittest.TestCase):
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein('goblin', 'gobiln'), 2)
+        self.assertEqual(levenshtein('goblin', 'goblins'), 1)
+        self.assertEqual(levenshtein('goblin', 'dragon', max_distance=1), 2)
+
+    def test_suggest(self):
+        index = FuzzyIndex({'goblin': 1, 'goblinking': 2, 'bonedragon': 3})
+        self.assertEqual(index.suggest('Gobln'), [1])
+        self.assertEqual(index.suggest('bone dargon'), [3])
+        self.assertEqual(index.suggest('xyz'), [])
+
+
+class DateRangeIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.events = [
+            {'type': '[WEEKLY_EVENT]', 'start': datetime.date(2021, 1, 4), 'end': datetime.date(2021, 1, 11)},
+            {'type': '[BOUNTY]', 'start': datetime.date(2021, 1, 1), 'end': datetime.date(2021, 1, 2)},
+            {'type': '[WEEKLY_EVENT]', 'start': datetime.date(2021, 1, 11), 'end': datetime.date(2021, 1, 18)},
+        ]
+        self.index = DateRangeIndex(self.events, 'start', 'end')
+
+    def test_between(self):
+        self.assertEqual(self.index.between(datetime.date(2021, 1, 2)), [self.events[0], self.events[2]])
+        self.assertEqual(self.index.between(datetime.date(2021, 1, 1), datetime.date(2021, 1, 4)),
+                         [self.events[1], self.events[0]])
+        self.assertEqual(self.index.between(datetime.date(2021, 1, 1), type_='[BOUNTY]'), [self.events[1]])
+        self.assertEqual(self.index.between(datetime.date(2021, 1, 1), type_='[INVASION]'), [])
+
+    def test_active_on(self):
+        self.assertEqual(self.index.active_on(datetime.date(2021, 1, 11)), [self.events[0], self.events[2]])
+        self.assertEqual(self.index.active_on(datetime.date(2021, 1, 3)), [])
+
+
+class CommandDispatcherTests(unittest.TestCase):
+    MESSAGES = [
+        '!troop Dwarven Valkyrie', 'DE-!TROOP zwerg', 'ру!troop x', '!Spoilers Troops', '!spoilers\n!help',
+        'hello\nfr!kingdom summary', '?troop x', '!class_level 1-20', '!CLASS_LEVEL 20', 'e!troop x',
+        '[6000,6001]', '> quote\n[6000]', '!news status', '!tower 5 a b c', '!unknown', 'just chatting',
+    ]
+
+    @staticmethod
+    def find_by_scanning(user_command, user_prefix):
+        for command in COMMAND_REGISTRY:
+            match = command['pattern'].search(user_command)
+            if match and match.groupdict().get('prefix', user_prefix) == user_prefix:
+                return command, match.groupdict()
+        return None, None
+
+    def test_same_result_as_scanning(self):
+        for prefix in ('!', 'e', '?'):
+            for message in self.MESSAGES:
+                self.assertEqual(COMMAND_DISPATCHER.find(message, prefix), self.find_by_scanning(message, prefix))
+
+    def test_rejects_chatter(self):
+        self.assertEqual(COMMAND_DISPATCHER.get_candidates('just chatting', '!'), set())
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_weighted_eviction(self):
+        cache = LRUCache(10, weigh=len)
+        cache.set('a', b'aaaa')
+        cache.set('b', b'bbbb')
+        cache.set('a', b'aa')
+        cache.set('c', b'cccccc')
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+        self.assertEqual(cache.stats()['weight'], 8)
+
+    def test_copy_on_read(self):
+        cache = LRUCache(2)
+        first = cache.get_or_create('troop', lambda: {'name': 'Goblin', 'traits': [{'name': 'Stoneskin'}]})
+        first['traits'][0]['name'] = 'changed'
+        second = cache.get_or_create('troop', lambda: {})
+        self.assertEqual(second['traits'][0]['name'], 'Stoneskin')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+class KingdomStatisticsTests(unittest.TestCase):
+    def setUp(self):
+        released = datetime.datetime(2021, 1, 1)
+        unreleased = datetime.datetime(2021, 2, 1)
+        self.troops = {
+            1: {'colors': ['blue'], 'release_date': released},
+            2: {'colors': ['red']},
+            3: {'colors': ['blue', 'red']},
+            4: {'colors': ['blue'], 'release_date': unreleased},
+        }
+        self.kingdoms = {
+            3000: {'id': 3000, 'location': 'krystara', 'troop_ids': [1, 2]},
+            3001: {'id': 3001, 'location': 'krystara', 'troop_ids': [3, 4]},
+            3002: {'id': 3002, 'location': 'underspire', 'troop_ids': [1]},
+        }
+        self.statistics = KingdomStatistics(self.kingdoms, self.troops)
+
+    def test_top_kingdoms(self):
+        now = datetime.datetime(2021, 1, 15)
+        result = self.statistics.top_kingdoms('colors', ['blue', 'red'], now)
+        self.assertEqual(result['blue'], {'kingdom_id': 3001, 'total': 1, 'fitting_troops': 1, 'percentage': 1.0})
+        self.assertEqual(result['red']['kingdom_id'], 3001)
+
+    def test_release_date_mask(self):
+        result = self.statistics.top_kingdoms('colors', ['blue'], datetime.datetime(2021, 3, 1))
+        self.assertEqual(result['blue']['total'], 2)
+
+
+class MaxPowerLevelTests(unittest.TestCase):
+    def test_weapon_tasks_block_later_levels(self):
+        released = datetime.datetime(2021, 1, 1)
+        world = GameData()
+        world.troops = {i: {'kingdom_id': 3000, 'release_date': released} for i in range(12)}
+        world.weapons = {1: {'kingdom': {'id': 3000}}, 2: {'kingdom': {'id': 3000}}}
+        world.classes = {1: {'kingdom_id': 3000}}
+        world.pets = mock.Mock(items={})
+        world.kingdoms = {3000: {'id': 3000, 'linked_kingdom_id': 3001, 'underworld': False}}
+        world.user_data['pTasksData'] = {'Kingdom': [
+            {'Id': 'KingdomTask1-Level', 'Task': 'IncreaseKingdomLevel', 'XValue': 10},
+            {'Id': 'KingdomTask2-Troops', 'Task': 'Own{x}Troops', 'XValue': 4},
+            {'Id': 'KingdomTask3-Weapons', 'Task': 'Own{x}Weapons', 'XValue': 2},
+            {'Id': 'KingdomTask4-Troops', 'Task': 'Own{x}Troops', 'XValue': 8},
+        ]}
+        world.populate_max_power_levels()
+        self.assertEqual(world.get_max_power_level(3000), 2)
+
+
+class DiskLRUCacheTests(unittest.TestCase):
+    def test_eviction_and_reload(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache = DiskLRUCache(folder, 10, '.png')
+            cache.set('a', b'aaaa')
+            cache.set('b', b'bbbb')
+            self.assertEqual(cache.get('a'), b'aaaa')
+            cache.set('c', b'cccc')
+            self.assertNotIn('b', cache)
+            self.assertIsNone(cache.get('b'))
+            self.assertEqual(cache.stats()['evictions'], 1)
+
+            reloaded = DiskLRUCache(folder, 10, '.png')
+            self.assertEqual(sorted(reloaded.entries), ['a', 'c'])
+            self.assertEqual(reloaded.get('c'), b'cccc')
+
+            cache.set('d', b'dd')
+            self.assertIn('d', reloaded)
+            self.assertEqual(reloaded.get('d'), b'dd')
+
+    def test_eviction_counts_files_of_other_processes(self):
+        with tempfile.TemporaryDirectory() as folder:
+            first = DiskLRUCache(folder, 10, '.png')
+            second = DiskLRUCache(folder, 10, '.png')
+            first.set('a', b'aaaa')
+            second.set('b', b'bbbb')
+            second.set('c', b'cccc')
+            self.assertEqual(sorted(os.listdir(folder)), ['b.png', 'c.png'])
+
+
+class ScheduledCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.datetime(2021, 1, 15)
+        self.cache = ScheduledCache([datetime.datetime(2021, 1, 1), datetime.datetime(2021, 2, 1)],
+                                    clock=lambda: self.now)
+
+    def test_valid_until_next_boundary(self):
+        self.assertEqual(self.cache.get_or_create('spoilers', lambda now: [now]), [self.now])
+        self.now = datetime.datetime(2021, 1, 31)
+        self.assertEqual(self.cache.get_or_create('spoilers', lambda now: [now]), [datetime.datetime(2021, 1, 15)])
+        self.now = datetime.datetime(2021, 2, 1)
+        self.assertEqual(self.cache.get_or_create('spoilers', lambda now: [now]), [self.now])
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    def test_no_upcoming_boundary(self):
+        self.now = datetime.datetime(2021, 3, 1)
+        self.cache.get_or_create('spoilers', lambda now: [])
+        self.assertIsNone(self.cache.entries['spoilers'][0])
+
+
+class TranslatingExpander:
+    @cpu_bound
+    def translate(self, key, lang):
+        return translate(key, lang)
+
+    @cpu_bound
+    def get_troop(self):
+        return Troop({'id': 6000, 'name': '[6000_NAME]', 'kingdom': Kingdom({'id': 3000})})
+
+
+class WorkerPoolTests(unittest.TestCase):
+    class Expander:
+        @cpu_bound
+        def heavy(self, value):
+            return threading.current_thread().name, value
+
+        def light(self, value):
+            return threading.current_thread().name, value
+
+    def test_only_cpu_bound_methods_are_offloaded(self):
+        expander = self.Expander()
+        pool = WorkerPool('thread', 1)
+        pool.start()
+        heavy_thread, heavy_value = asyncio.run(pool.call(expander.heavy, 1))
+        light_thread, light_value = asyncio.run(pool.call(expander.light, 2))
+        self.assertTrue(heavy_thread.startswith('worker'))
+        self.assertEqual(light_thread, threading.current_thread().name)
+        self.assertEqual((heavy_value, light_value), (1, 2))
+        self.assertEqual(pool.pending, 0)
+
+    def test_process_workers_pick_up_reloaded_languages(self):
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch.dict(CONFIG.raw_config, {'game_assets_folder': folder, 'snapshot_folder': folder}):
+            def write_tables(name):
+                for filename in LANG_FILES:
+                    with open(os.path.join(folder, filename), 'w') as f:
+                        json.dump({'[NAME]': f'{name} {filename}'}, f)
+
+            write_tables('old')
+            expander = TranslatingExpander()
+            pool = WorkerPool('process', 1, loader=TranslatingExpander)
+            pool.start()
+            try:
+                old_name = asyncio.run(pool.call(expander.translate, '[NAME]', 'de'))
+                write_tables('new')
+                pool.start()
+                new_name = asyncio.run(pool.call(expander.translate, '[NAME]', 'de'))
+                troop = asyncio.run(pool.call(expander.get_troop))
+            finally:
+                pool.executor.shutdown()
+            self.assertEqual(old_name, 'old GemsOfWar_German.json')
+            self.assertEqual(new_name, 'new GemsOfWar_German.json')
+            self.assertEqual(troop, {'id': 6000, 'name': '[6000_NAME]', 'kingdom': {'id': 3000}})
+            self.assertIsInstance(troop['kingdom'], dict)
+
+
+class DBWriterTests(unittest.TestCase):
+    def test_failed_write_does_not_affect_its_batch(self):
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch.dict(CONFIG.raw_config, {'database': os.path.join(folder, 'test.sqlite3')}):
+            writer = DBWriter()
+            try:
+                async def write():
+                    await writer.execute('CREATE TABLE Test (id INTEGER PRIMARY KEY)')
+                    return await asyncio.gather(*[writer.execute('INSERT INTO Test (id) VALUES (?)', (i,))
+                                                  for i in (1, 2, 2, 3)], return_exceptions=True)
+
+                results = asyncio.run(write())
+                writer.stop()
+                self.assertEqual(results[:2] + results[3:], [1, 1, 1])
+                self.assertIsInstance(results[2], sqlite3.IntegrityError)
+                rows = sqlite3.connect(CONFIG.get('database')).execute('SELECT id FROM Test').fetchall()
+                self.assertEqual(rows, [(1,), (2,), (3,)])
+            finally:
+                writer.stop()
+                DB.close_all()
+
+    def test_staged_change_is_undone_when_the_write_fails(self):
+        bookmarks = {'a': 1}
+
+        async def fail():
+            raise sqlite3.OperationalError('database is locked')
+
+        async def write(*change):
+            with staged(bookmarks, *change):
+                await fail()
+
+        for change in (('a',), ('a', 2), ('b', 3)):
+            with self.assertRaises(sqlite3.OperationalError):
+                asyncio.run(write(*change))
+        self.assertEqual(bookmarks, {'a': 1})
+
+    def test_create_schema_on_existing_database(self):
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch.dict(CONFIG.raw_config, {'database': os.path.join(folder, 'test.sqlite3')}):
+            try:
+                DB.create_schema()
+                DB.create_schema()
+                self.assertEqual(NewsQueue.get_pending(), [])
+            finally:
+                DB.close_all()
+
+
+class NewsDeliveryTests(unittest.TestCase):
+    class Client:
+        async def is_writable(self, channel):
+            if channel.id == 1:
+                raise RuntimeError('permissions unavailable')
+            return True
+
+        def get_channel(self, channel_id):
+            channel = mock.Mock(id=channel_id)
+            channel.send = mock.AsyncMock()
+            return channel
+
+    def test_failing_channel_does_not_stop_the_others(self):
+        deliveries = [{'article_id': 1, 'channel_id': channel_id, 'attempts': 0, 'created': datetime.datetime.utcnow(),
+                       'article': {'platform': 'pc', 'title': 'News'}} for channel_id in (1, 2)]
+        client = self.Client()
+        client.views = mock.Mock(render_news=lambda article: ['embed'])
+        delivery = NewsDelivery(concurrency=2)
+        with mock.patch.object(NewsQueue, 'get_pending', return_value=deliveries), \
+                mock.patch.object(NewsQueue, 'finish', mock.AsyncMock()) as finish, \
+                mock.patch.object(NewsQueue, 'prune', mock.AsyncMock()):
+            asyncio.run(delivery.run(client))
+        results = {result[0]['channel_id']: result[1] for result in finish.call_args.args[0]}
+        self.assertIn('permissions unavailable', results[1])
+        self.assertIsNone(results[2])
+        self.assertEqual(delivery.results, [])
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_waits_for_refill(self):
+        bucket = TokenBucket(2, 0.2)
+
+        async def acquire(times):
+            for _ in range(times):
+                await bucket.acquire()
+
+        start = time.monotonic()
+        asyncio.run(acquire(2))
+        self.assertLess(time.monotonic() - start, 0.05)
+        asyncio.run(acquire(2))
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+class SnapshotTests(unittest.TestCase):
+    def test_stale_snapshot_is_not_loaded(self):
+        with tempfile.TemporaryDirectory() as folder, \
+                mock.patch.dict(CONFIG.raw_config, {'game_assets_folder': folder, 'snapshot_folder': folder}):
+            with open(os.path.join(folder, 'Data.json'), 'w') as f:
+                json.dump({'version': 1}, f)
+            snapshot.save('test', ['Data.json'], {'troops': [1, 2]})
+            self.assertEqual(snapshot.load('test', ['Data.json']), {'troops': [1, 2]})
+            with open(os.path.join(folder, 'Data.json'), 'w') as f:
+                json.dump({'version': 2}, f)
+            with mock.patch('pickle.load', wraps=pickle.load) as load:
+                self.assertIsNone(snapshot.load('test', ['Data.json']))
+            self.assertEqual(load.call_count, 1)
+            self.assertEqual(sorted(os.listdir(folder)), ['Data.json', 'test.pickle'])
+
+
+class TranslationStoreTests(unittest.TestCase):
+    class Tables:
+        def __init__(self, text):
+            self.text = text
+
+        def get(self, key, lang=''):
+            return f'{key} {self.text}'
+
+    def test_pinned_tables_outlive_a_swap(self):
+        store = TranslationStore()
+        store.swap(self.Tables('old'))
+        pinned = threading.Event()
+        swapped = threading.Event()
+        results = []
+
+        def request():
+            with store.pinned():
+                pinned.set()
+                swapped.wait()
+                results.append(store.local.translations.get('[NAME]'))
+            results.append(store.local.translations.get('[NAME]'))
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        pinned.wait()
+        store.swap(self.Tables('new'))
+        swapped.set()
+        thread.join()
+        self.assertEqual(results, ['[NAME] old', '[NAME] new'])
+        self.assertEqual(store.local.translations.get('[NAME]'), '[NAME] new')
+
+
+class RenderPoolTests(unittest.TestCase):
+    def test_render_and_timeout(self):
+        pool = RenderPool(size=1, queue_size=1, timeout=5)
+        try:
+            self.assertEqual(asyncio.run(pool.render(operator.add, 1, 2)), 3)
+            pool.timeout = 0.5
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(pool.render(time.sleep, 10))
+            self.assertIsNone(pool.pool)
+            with self.assertRaises(RenderWorkerError):
+                asyncio.run(pool.render(operator.truediv, 1, 0))
+        finally:
+            pool.restart()
+
+    def test_queue_full(self):
+        pool = RenderPool(size=1, queue_size=0)
+        with self.assertRaises(RenderQueueFull):
+            asyncio.run(pool.render(operator.add, 1, 2))
+
+
+class EntityTests(unittest.TestCase):
+    def setUp(self):
+        self.kingdom = Kingdom({'id': 3000, 'name': '[3000_NAME]', 'colors': ['blue', 'red']})
+        self.troop = Troop({'id': 6000, 'name': '[6000_NAME]', 'colors': ['green'], 'rarity': 'Mythic',
+                            'types': ['Dwarf', 'Goblin'], 'kingdom': self.kingdom})
+
+    def test_reading(self):
+        self.assertEqual(self.troop['types'], ['Dwarf', 'Goblin'])
+        self.assertEqual(self.troop['rarity'], 'Mythic')
+        self.assertEqual(self.troop['kingdom']['colors'], ['blue', 'red'])
+        self.assertNotIn('release_date', self.troop)
+        self.assertIsNone(self.troop.get('release_date'))
+        with self.assertRaises(KeyError):
+            self.troop['copy']
+
+    def test_read_only(self):
+        with self.assertRaises(TypeError):
+            self.troop['name'] = 'Dwarf'
+        with self.assertRaises(AttributeError):
+            self.troop.name = 'Dwarf'
+
+    def test_copy(self):
+        troop = self.troop.copy()
+        troop['colors'].append('red')
+        self.assertIsInstance(troop, dict)
+        self.assertEqual(self.troop['colors'], ['green'])
+
+    def test_pickle(self):
+        troop = pickle.loads(pickle.dumps(self.troop))
+        self.assertEqual(troop.copy().keys(), self.troop.copy().keys())
+        self.assertEqual(troop['kingdom']['colors'], ['blue', 'red'])
+
+    def test_translated_view(self):
+        view = TranslatedView(self.troop)
+        view['name'] = 'Dwarf'
+        view['kingdom_title'] = 'Kingdom'
+        self.assertEqual((view['name'], view['rarity']), ('Dwarf', 'Mythic'))
+        self.assertEqual(self.troop['name'], '[6000_NAME]')
+        self.assertEqual(list(view)[-1], 'kingdom_title')
+        self.assertEqual(len(view), len(self.troop) + 1)
+        cached = LRUCache(1).get_or_create('troop', lambda: view)
+        cached['name'] = 'Goblin'
+        self.assertEqual(view['name'], 'Dwarf')
+
 
 if __name__ == '__main__':
     unittest.main()
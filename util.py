@@ -83,6 +83,26 @@ def extract_search_tag(search_term):
     return search_term.lower()
 
 
+def levenshtein(a, b, max_distance=None):
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    previous_row = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current_row = [i]
+        for j, char_b in enumerate(b, start=1):
+            current_row.append(min(
+                previous_row[j] + 1,
+                current_row[j - 1] + 1,
+                previous_row[j - 1] + (char_a != char_b),
+            ))
+        if max_distance is not None and min(current_row) > max_distance:
+            return max_distance + 1
+        previous_row = current_row
+    return previous_row[-1]
+
+
 def translate_day(day_no, locale):
     locale = LANGUAGE_CODE_MAPPING.get(locale, locale)
     locale = LOCALE_MAPPING.get(locale, 'en_GB') + '.UTF8'
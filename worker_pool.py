@@ -0,0 +1,119 @@
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import time
+from collections.abc import Mapping
+
+import translations
+from configurations import CONFIG
+from metrics import METRICS
+
+# in worker processes: how to load the game data, the loaded data and the pool generation it belongs to
+LOADER = None
+EXPANDER = None
+GENERATION = None
+
+
+def cpu_bound(function):
+    function.cpu_bound = True
+    return function
+
+
+def run_timed(function, args, submitted):
+    start = time.time()
+    result = function(*args)
+    return start - submitted, time.time() - start, result
+
+
+def run_pinned(tables, function, args, submitted):
+    # the whole job translates with the tables that were current when it was submitted
+    with translations.STORE.pinned(tables):
+        return run_timed(function, args, submitted)
+
+
+def plain(data, copies=None):
+    """Turns entities and views into dicts, so a result does not drag the entity graph behind it when pickled."""
+    if copies is None:
+        copies = {}
+    if isinstance(data, list):
+        return [plain(value, copies) for value in data]
+    if not isinstance(data, Mapping):
+        return data
+    if id(data) not in copies:
+        copies[id(data)] = result = {}
+        result.update((key, plain(value, copies)) for key, value in data.items())
+    return copies[id(data)]
+
+
+def load_team_expander():
+    from search import TeamExpander
+    return TeamExpander()
+
+
+def init_worker(config, loader, generation):
+    global LOADER
+    # a spawned worker reads the settings files again, runtime changes have to be handed over
+    CONFIG.raw_config.update(config)
+    LOADER = loader
+    load_expander(generation)
+
+
+def load_expander(generation):
+    global EXPANDER, GENERATION
+    # the store keeps the tables it loaded first, reloaded languages only show up in a fresh snapshot
+    translations.STORE.swap(translations.Translations())
+    EXPANDER = LOADER()
+    GENERATION = generation
+
+
+def run_in_worker(generation, method_name, args, submitted):
+    if generation != GENERATION:
+        # the game data was reloaded since this worker loaded it, the new snapshots are already saved
+        load_expander(generation)
+    wait, duration, result = run_timed(getattr(EXPANDER, method_name), args, submitted)
+    return wait, duration, plain(result)
+
+
+class WorkerPool:
+    def __init__(self, kind='thread', size=4, loader=load_team_expander):
+        self.kind = kind
+        self.size = size
+        self.loader = loader
+        self.pending = 0
+        self.executor = None
+        self.generation = 0
+
+    def start(self):
+        """Called whenever the game data changes, worker processes load the new snapshot before their next job."""
+        self.generation += 1
+        if self.executor is not None:
+            return
+        if self.kind == 'process':
+            # a fresh interpreter per worker, forking next to the db writer and executor threads can deadlock
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                self.size, mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker, initargs=(dict(CONFIG.raw_config), self.loader, self.generation))
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(self.size, thread_name_prefix='worker')
+
+    async def call(self, method, *args):
+        if self.executor is None or not getattr(method, 'cpu_bound', False):
+            return method(*args)
+        if self.kind == 'process':
+            job = functools.partial(run_in_worker, self.generation, method.__name__, args, time.time())
+        else:
+            job = functools.partial(run_pinned, translations.STORE.get_translations(), method, args, time.time())
+
+        self.pending += 1
+        METRICS.observe('worker_pool_queue_depth', self.pending)
+        try:
+            wait, duration, result = await asyncio.get_event_loop().run_in_executor(self.executor, job)
+        finally:
+            self.pending -= 1
+        METRICS.observe('worker_pool_wait_seconds', wait)
+        METRICS.observe('worker_pool_run_seconds', duration)
+        return result
+
+
+WORKER_POOL = WorkerPool(CONFIG.get('worker_pool'), CONFIG.get('worker_pool_size'))